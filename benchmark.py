@@ -0,0 +1,398 @@
+"""Offline benchmarks for the traffic collector.
+
+Usage: python benchmark.py <name> [options]
+"""
+import os
+import sys
+import glob
+import time
+import json
+import argparse
+import subprocess
+import threading
+
+# ================= HELPERS =================
+
+def timed(func, repeats):
+    """Runs func repeats times after one warm-up call. Returns the mean seconds per call."""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+def synthetic_history(days, seed=0):
+    """Rows in the traffic_data.csv layout: every route x half-hour slot (0800-2100) for a number of days."""
+    import numpy as np
+    import pandas as pd
+    from datetime import date, timedelta
+    from traffic_collector import ROUTES
+    from traffic_storage import COLUMNS
+
+    rng = np.random.default_rng(seed)
+    slots = [h * 100 + m for h in range(8, 22) for m in (0, 30) if h * 100 + m <= 2100]
+    routes = pd.DataFrame(ROUTES)
+    frames = []
+    for d in range(days):
+        day = date(2026, 1, 5) + timedelta(days=d)
+        # One block of ROUTES per slot, in the order main() appends them
+        df = pd.concat([routes] * len(slots), ignore_index=True)
+        n = len(df)
+        df['timestamp'] = np.repeat(slots, len(routes))
+        df['is_PeakHour'] = df['timestamp'].between(800, 900) | df['timestamp'].between(1200, 1300) | df['timestamp'].between(1730, 1900)
+        df['time_of_day'] = np.where(df['timestamp'] < 1730, 'DAY', 'NIGHT')
+        df['day_name'] = day.strftime('%A').upper()
+        df['type_of_day'] = 'WEEKEND' if day.weekday() >= 5 else 'WEEKDAY'
+        df['month'] = day.strftime('%B').upper()
+        df['date'] = day.strftime('%d.%m.%y')
+        for col in ['origin_Raining', 'origin_Windy', 'origin_Hot', 'is_Jam']:
+            df[col] = (rng.random(n) < 0.2).astype(int)
+        df['origin _ClearVisibility'] = 1 - df['origin_Raining']
+        df['origin_VehicleConcentration'] = np.where(df['active_CAM'] == 1,
+                                                     rng.choice(['LIGHT', 'MODERATE', 'HEAVY'], n), 'NA')
+        df['is_Holiday'] = df['is_SchoolHoliday'] = df['is_Festive'] = 0
+        df['calculated_journeytime_minute'] = rng.integers(2, 25, n)
+        df['data_Pass'] = 1
+        frames.append(df)
+    history = pd.concat(frames, ignore_index=True)
+    history['is_PeakHour'] = history['is_PeakHour'].astype(int)
+    return history[COLUMNS]
+
+def reference_frames():
+    """The bundled *-CAPTUREWITHINGREENLINE.jpg images, decoded."""
+    import cv2
+    return [cv2.imread(p) for p in sorted(glob.glob('*-CAPTUREWITHINGREENLINE.jpg'))]
+
+# ================= BENCHMARKS =================
+
+def bench_yolo(args):
+    """Per-frame vs batched YOLO latency on the bundled reference images."""
+    from ultralytics import YOLO
+    from detector import detect_batch, detect_single
+
+    model = YOLO(args.weights)
+    frames = reference_frames()
+    print(f"{len(frames)} frames, imgsz={args.imgsz}, batch_size={args.batch_size}, repeats={args.repeats}")
+
+    per_frame = timed(lambda: [detect_single(model, f, imgsz=args.imgsz) for f in frames], args.repeats)
+    batched = timed(lambda: detect_batch(model, frames, imgsz=args.imgsz, batch_size=args.batch_size), args.repeats)
+
+    print(f"per-frame: {per_frame * 1000:8.1f} ms/run")
+    print(f"batched:   {batched * 1000:8.1f} ms/run")
+    print(f"speedup:   {per_frame / batched:8.2f}x")
+
+def run_fresh(code, env=None):
+    """Runs code in a new interpreter and returns its wall time in seconds."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL,
+                   env={**os.environ, **(env or {})})
+    return time.perf_counter() - start
+
+def bench_startup(args):
+    """Cold-start cost in fresh processes: module import, then first inference per backend."""
+    print(f"import traffic_collector:        {run_fresh('import traffic_collector'):6.2f} s")
+    first_frame = (
+        "import traffic_collector, cv2, glob;"
+        "from detector import detect_batch, get_model;"
+        "detect_batch(get_model(), [cv2.imread(sorted(glob.glob('*-CAPTUREWITHINGREENLINE.jpg'))[0])])"
+    )
+    for backend in args.backends:
+        t = run_fresh(first_frame, env={'YOLO_BACKEND': backend})
+        print(f"first inference ({backend:>8}):     {t:6.2f} s")
+
+def bench_traffic(args):
+    """One request per route vs deduplicated, batched Distance Matrix requests (offline fake provider)."""
+    from datetime import datetime
+    from traffic_collector import ROUTES
+    from traffic_provider import TRAFFIC_BATCHING, FakeTrafficProvider
+
+    pairs = [(r['origin_coordinate'], r['destination_coordinate']) for r in ROUTES]
+    departure = datetime.now()
+    print(f"{len(pairs)} routes, {len(set(pairs))} unique pairs, simulated latency {args.latency * 1000:.0f} ms/request")
+
+    provider = FakeTrafficProvider(latency=args.latency)
+    start = time.perf_counter()
+    for origin, dest in pairs:
+        provider.query([origin], [dest], departure)
+    print(f"per-route: {(time.perf_counter() - start) * 1000:8.1f} ms, {len(pairs)} requests")
+
+    provider = FakeTrafficProvider(latency=args.latency)
+    start = time.perf_counter()
+    provider.journey_times(pairs, departure)
+    print(f"batched:   {(time.perf_counter() - start) * 1000:8.1f} ms, {provider.requests} requests, "
+          f"{provider.elements} billed elements ({TRAFFIC_BATCHING})")
+
+    start = time.perf_counter()
+    provider.journey_times(pairs, departure)
+    print(f"cached:    {(time.perf_counter() - start) * 1000:8.1f} ms, {provider.requests} requests in total")
+
+def bench_storage(args):
+    """Size and read time of the single CSV vs date-partitioned Parquet, on synthetic history."""
+    import shutil
+    import tempfile
+    import pandas as pd
+    from traffic_storage import read_rows, write_rows, compact
+
+    history = synthetic_history(args.days)
+    tmp = tempfile.mkdtemp()
+    try:
+        csv_path = os.path.join(tmp, 'traffic_data.csv')
+        history.to_csv(csv_path, index=False)
+        root = os.path.join(tmp, 'traffic')
+        # One file per run, as the collector writes them, then compacted
+        for _, run in history.groupby(['date', 'timestamp'], sort=False):
+            write_rows(run, root)
+        files_before = sum(len(f) for _, _, f in os.walk(root))
+        compact(root)
+
+        parquet_size = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(root) for f in fs)
+        print(f"{len(history)} rows over {args.days} days ({files_before} run files before compaction)")
+        print(f"CSV:     {os.path.getsize(csv_path) / 1e6:8.2f} MB")
+        print(f"Parquet: {parquet_size / 1e6:8.2f} MB")
+
+        csv_read = timed(lambda: pd.read_csv(csv_path, keep_default_na=False), args.repeats)
+        parquet_read = timed(lambda: read_rows(root), args.repeats)
+        one_day = timed(lambda: read_rows(root, start=pd.Timestamp('2026-01-05').date(),
+                                          end=pd.Timestamp('2026-01-05').date()), args.repeats)
+        print(f"read all (CSV):     {csv_read * 1000:8.1f} ms")
+        print(f"read all (Parquet): {parquet_read * 1000:8.1f} ms")
+        print(f"read one day:       {one_day * 1000:8.1f} ms")
+    finally:
+        shutil.rmtree(tmp)
+
+def bench_replay(args):
+    """Frames/sec replaying an archive through the process pool, per worker count (synthetic archive)."""
+    import shutil
+    import tempfile
+    import cv2
+    import numpy as np
+    from datetime import datetime, timedelta
+    from traffic_collector import CAMERA_MAP
+    from traffic_storage import write_rows
+    from frame_archive import archive_frame, replay
+
+    history = synthetic_history(args.days)
+    tmp = tempfile.mkdtemp()
+    try:
+        root, archive = os.path.join(tmp, 'traffic'), os.path.join(tmp, 'frames')
+        write_rows(history, root)
+        # One distinct frame per camera and slot: the reference image with a little noise
+        rng = np.random.default_rng(0)
+        references = {cam: cv2.imread(c['ref']) for cam, c in CAMERA_MAP.items()}
+        for (date_str, stamp), _ in history.groupby(['date', 'timestamp'], sort=False):
+            captured = datetime.strptime(date_str, "%d.%m.%y") + timedelta(hours=stamp // 100, minutes=stamp % 100 + 1)
+            for cam, ref in references.items():
+                noisy = cv2.add(ref, rng.integers(0, 8, ref.shape, dtype=np.uint8))
+                archive_frame(cam, cv2.imencode('.jpg', noisy)[1].tobytes(), captured, archive,
+                              slot=captured)
+
+        start = datetime(2026, 1, 5).date()
+        end = start + timedelta(days=args.days - 1)
+        for workers in args.workers:
+            frames, changed, seconds = replay(start, end, root=root, archive=archive, workers=workers,
+                                              batch_size=args.batch_size, dry_run=True)
+            print(f"workers={workers:<3} {frames} frames in {seconds:6.2f}s: {frames / seconds:7.1f} frames/s")
+    finally:
+        shutil.rmtree(tmp)
+
+def bench_predict(args):
+    """Predictions/sec: row-at-a-time scoring vs the one-pass forecast grid (model trained on synthetic history)."""
+    import tempfile
+    from datetime import datetime
+    from prediction import forecast_grid, train, typical_conditions
+
+    history = synthetic_history(args.days)
+    with tempfile.TemporaryDirectory() as tmp:
+        model, encoder = train(history, path=os.path.join(tmp, 'model.npz'), epochs=args.epochs)
+    grid = forecast_grid(datetime(2026, 3, 24, 7, 0), args.hours, typical_conditions(history))
+    # Row-at-a-time is slow, so it is timed on a sample and reported as a rate
+    rows = [grid.iloc[[i]] for i in range(min(args.sample, len(grid)))]
+    print(f"{len(grid)} predictions per forecast ({args.hours}h window)")
+
+    per_row = timed(lambda: [model.predict(encoder.transform(r)) for r in rows], 1) * len(grid) / len(rows)
+    encode = timed(lambda: encoder.transform(grid), args.repeats)
+    X = encoder.transform(grid)
+    score = timed(lambda: model.predict(X), args.repeats)
+    print(f"row at a time:     {per_row * 1000:9.1f} ms  {len(grid) / per_row:12.0f} predictions/s")
+    print(f"batched (encode):  {encode * 1000:9.1f} ms")
+    print(f"batched (score):   {score * 1000:9.1f} ms")
+    print(f"batched (total):   {(encode + score) * 1000:9.1f} ms  {len(grid) / (encode + score):12.0f} predictions/s")
+
+# ================= END-TO-END =================
+
+def stand_in_server():
+    """Local stand-ins for Open-Meteo, the Distance Matrix API and the camera hosts.
+
+    Weather is fixed, journey times use FakeTrafficProvider's model, and each camera
+    serves its bundled reference JPEG with an ETag. Returns (server, base_url).
+    Collector modules are only imported per request, so callers can point the
+    collector's environment at base_url before importing it.
+    """
+    import hashlib
+    from datetime import datetime
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, unquote, urlsplit
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, status, body=b"", content_type='application/json', headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            from traffic_collector import CAMERA_MAP
+            from traffic_provider import FakeTrafficProvider
+
+            url = urlsplit(self.path)
+            camera = unquote(url.path[len('/camera/'):])
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == '/v1/forecast':
+                current = {'temperature_2m': 31.0, 'weather_code': 3, 'wind_speed_10m': 8.0, 'visibility': 24000}
+                count = len(query['latitude'].split(','))
+                body = [{'current': current}] * count if count > 1 else {'current': current}
+                self.reply(200, json.dumps(body).encode())
+            elif url.path == '/maps/api/distancematrix/json':
+                origins, dests = query['origins'].split('|'), query['destinations'].split('|')
+                matrix = FakeTrafficProvider().query(origins, dests, datetime.fromtimestamp(int(query['departure_time'])))
+                rows = [{'elements': [{'status': 'OK',
+                                       'duration': {'value': round(matrix[(o, d)][0] * 60)},
+                                       'duration_in_traffic': {'value': round(matrix[(o, d)][1] * 60)}}
+                                      for d in dests]} for o in origins]
+                self.reply(200, json.dumps({'status': 'OK', 'rows': rows}).encode())
+            elif url.path.startswith('/camera/') and camera in CAMERA_MAP:
+                with open(CAMERA_MAP[camera]['ref'], 'rb') as f:
+                    body = f.read()
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.reply(304, headers={'ETag': etag})
+                else:
+                    self.reply(200, body, 'image/jpeg', {'ETag': etag})
+            else:
+                self.reply(404)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def bench_e2e(args):
+    """main() end to end against local stand-ins for Open-Meteo, Google Maps and the cameras."""
+    import io
+    import shutil
+    import tempfile
+    import contextlib
+    from datetime import datetime
+    from urllib.parse import quote
+
+    server, base_url = stand_in_server()
+    tmp = tempfile.mkdtemp()
+    # The collector reads its URLs and paths at import time
+    os.environ.update({
+        'TRAFFIC_PROVIDER': 'google',
+        'GOOGLE_MAPS_KEY': 'AIzaOfflineBenchmarkKey',
+        'GOOGLE_MAPS_BASE_URL': base_url,
+        'OPEN_METEO_URL': f"{base_url}/v1/forecast",
+        'TRAFFIC_STORAGE_DIR': os.path.join(tmp, 'traffic'),
+        'WEATHER_CACHE': os.path.join(tmp, 'weather'),
+        'ZONE_CACHE_DIR': os.path.join(tmp, 'zones'),
+        'COLLECTOR_METRICS': os.path.join(tmp, 'metrics.json'),
+        'WRITE_LEGACY_CSV': '0',
+    })
+    import traffic_collector
+    from instrumentation import metrics
+
+    for name, camera in traffic_collector.CAMERA_MAP.items():
+        camera['url'] = f"{base_url}/camera/{quote(name)}"
+
+    kl_now = datetime.fromisoformat(args.kl_time)
+    runs = []
+    try:
+        for _ in range(1 + args.repeats):
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+                traffic_collector.main(kl_now=kl_now)
+            runs.append(metrics.snapshot())
+    finally:
+        server.shutdown()
+        shutil.rmtree(tmp)
+
+    # The first run pays for the model load, mask build and empty caches
+    cold, warm = runs[0], runs[1:] or runs[:1]
+    def warm_seconds(stage):
+        return sum(r['stages'].get(stage, {}).get('seconds', 0) for r in warm) / len(warm)
+    stages = sorted(set(cold['stages']).union(*(r['stages'] for r in warm)))
+    print(f"{len(traffic_collector.ROUTES)} routes, {len(traffic_collector.CAMERA_MAP)} cameras, "
+          f"1 cold + {args.repeats} warm runs at {kl_now:%Y-%m-%d %H:%M}")
+    print(f"{'stage':<16}{'cold (ms)':>12}{'warm (ms)':>12}")
+    for stage in stages:
+        print(f"{stage:<16}{cold['stages'].get(stage, {}).get('seconds', 0) * 1000:12.1f}{warm_seconds(stage) * 1000:12.1f}")
+    warm_total = sum(r['total_seconds'] for r in warm) / len(warm)
+    print(f"{'total':<16}{cold['total_seconds'] * 1000:12.1f}{warm_total * 1000:12.1f}")
+    print(f"counters (cold): {cold['counters']}")
+    print(f"counters (last): {runs[-1]['counters']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'kl_time': args.kl_time, 'runs': runs}, f, indent=2)
+        print(f"Wrote {args.output}")
+
+BENCHMARKS = {
+    'yolo': bench_yolo,
+    'startup': bench_startup,
+    'traffic': bench_traffic,
+    'storage': bench_storage,
+    'e2e': bench_e2e,
+    'replay': bench_replay,
+    'predict': bench_predict,
+}
+
+def main(argv=None):
+    from detector import YOLO_IMGSZ, YOLO_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(description="Offline benchmarks for traffic_collector")
+    sub = parser.add_subparsers(dest='name', required=True)
+
+    p = sub.add_parser('yolo', help=bench_yolo.__doc__)
+    p.add_argument('--weights', default='yolo11n.pt')
+    p.add_argument('--imgsz', type=int, default=YOLO_IMGSZ)
+    p.add_argument('--batch-size', type=int, default=YOLO_BATCH_SIZE)
+    p.add_argument('--repeats', type=int, default=5)
+
+    p = sub.add_parser('startup', help=bench_startup.__doc__)
+    p.add_argument('--backends', nargs='+', default=['pt'], help="any of: pt onnx openvino")
+
+    p = sub.add_parser('traffic', help=bench_traffic.__doc__)
+    p.add_argument('--latency', type=float, default=0.15, help="simulated seconds per request")
+
+    p = sub.add_parser('storage', help=bench_storage.__doc__)
+    p.add_argument('--days', type=int, default=90)
+    p.add_argument('--repeats', type=int, default=3)
+
+    p = sub.add_parser('e2e', help=bench_e2e.__doc__)
+    p.add_argument('--repeats', type=int, default=3, help="warm runs after the first (cold) one")
+    p.add_argument('--kl-time', default='2026-03-24T08:30', help="KL time the runs are stamped with")
+    p.add_argument('--output', help="write every run's metrics to this JSON file")
+    p.add_argument('--verbose', action='store_true', help="show the collector's own output")
+
+    p = sub.add_parser('replay', help=bench_replay.__doc__)
+    p.add_argument('--days', type=int, default=1)
+    p.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    p.add_argument('--batch-size', type=int, default=YOLO_BATCH_SIZE)
+
+    p = sub.add_parser('predict', help=bench_predict.__doc__)
+    p.add_argument('--days', type=int, default=30, help="synthetic history to train on")
+    p.add_argument('--epochs', type=int, default=5)
+    p.add_argument('--hours', type=int, default=48)
+    p.add_argument('--repeats', type=int, default=20)
+    p.add_argument('--sample', type=int, default=200, help="rows timed one at a time")
+
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.name](args)
+
+if __name__ == "__main__":
+    sys.exit(main())
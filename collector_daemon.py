@@ -0,0 +1,251 @@
+"""Resident collector daemon.
+
+Keeps the YOLO model, zone masks, HTTP sessions and holiday calendar in memory and
+schedules collection itself on KL time, instead of starting a new process every slot.
+
+    python collector_daemon.py                  (or: python traffic_collector.py --daemon)
+    python collector_daemon.py --fake-clock 2026-03-24T07:50 --until 2026-03-24T22:00 --dry-run
+
+Cameras and weather are refreshed on their own (jittered) intervals; each half-hour
+slot writes rows using the freshest values instead of fetching them again.
+"""
+import os
+import signal
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from traffic_collector import CAMERA_MAP, ROUTES, in_operating_hours, kl_time, route_cameras
+
+# ================= CONFIGURATION =================
+SLOT_INTERVAL = 30 * 60
+CAMERA_INTERVAL = int(os.environ.get('DAEMON_CAMERA_INTERVAL', 10 * 60))
+WEATHER_INTERVAL = int(os.environ.get('DAEMON_WEATHER_INTERVAL', 15 * 60))
+# Cameras and weather fire a random 0-JITTER seconds *before* each boundary, so the
+# sources don't hit their hosts in lockstep and are fresh when the slot runs on the boundary
+JITTER = int(os.environ.get('DAEMON_JITTER', 20))
+
+OPEN_HOUR = 8
+
+# ================= CLOCKS =================
+
+class SystemClock:
+    """Real KL time. sleep() wakes early when the daemon is asked to stop."""
+    def __init__(self):
+        self.stop_event = threading.Event()
+
+    def now(self):
+        return kl_time()
+
+    def sleep(self, seconds):
+        self.stop_event.wait(max(0, seconds))
+
+class FakeClock:
+    """Offline clock: sleep() advances time instantly, so a whole day runs in seconds."""
+    def __init__(self, start):
+        self.current = start
+        self.stop_event = threading.Event()
+
+    def now(self):
+        return self.current
+
+    def sleep(self, seconds):
+        self.current += timedelta(seconds=max(0, seconds))
+
+# ================= SCHEDULER =================
+
+class Job:
+    """A source refreshed every interval seconds, aligned to KL midnight, up to jitter seconds early."""
+    def __init__(self, name, interval, action, jitter=0):
+        self.name = name
+        self.interval = interval
+        self.action = action
+        self.jitter = jitter
+        self.due = None
+        self.runs = 0
+
+    def schedule(self, after, rng, inclusive=False):
+        """Sets due to the first interval boundary after (or at, if inclusive) the given time."""
+        midnight = after.replace(hour=0, minute=0, second=0, microsecond=0)
+        elapsed = (after - midnight).total_seconds()
+        boundaries = elapsed // self.interval
+        if not (inclusive and elapsed % self.interval == 0):
+            boundaries += 1
+        self.boundary = midnight + timedelta(seconds=boundaries * self.interval)
+        self.due = self.boundary - timedelta(seconds=rng.uniform(0, self.jitter) if self.jitter else 0)
+
+def next_slot(now):
+    """Start of the slot the next collect_slot run writes (the half-hour boundary at or after now)."""
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + timedelta(seconds=-(-(now - midnight).total_seconds() // SLOT_INTERVAL) * SLOT_INTERVAL)
+
+def next_opening(now):
+    """Start of the next operating window (0800 KL)."""
+    opening = now.replace(hour=OPEN_HOUR, minute=0, second=0, microsecond=0)
+    return opening if opening > now else opening + timedelta(days=1)
+
+class CollectorDaemon:
+    def __init__(self, clock, jobs, until=None, seed=None):
+        self.clock = clock
+        self.jobs = jobs            # run in list order when several are due together
+        self.until = until
+        self.rng = random.Random(seed)
+        self.stopping = False
+
+    def stop(self, *_):
+        print("Shutdown requested; finishing the current job.")
+        self.stopping = True
+        self.clock.stop_event.set()
+
+    def run_job(self, job, now):
+        # A stall (suspend, slow run) longer than an interval is caught up once, not replayed
+        missed = int((now - job.boundary).total_seconds() // job.interval)
+        if missed > 0:
+            print(f"[{now:%H:%M:%S}] {job.name}: {missed} run(s) missed, catching up once")
+        try:
+            job.action(now)
+        except Exception as e:
+            print(f"[{now:%H:%M:%S}] {job.name} failed: {e}")
+        job.runs += 1
+        # After a catch-up, realign to the clock; otherwise move to the next boundary, which
+        # may already be past if the job overran (it then runs straight away, once)
+        job.schedule(self.clock.now() if missed > 0 else job.boundary, self.rng)
+
+    def loop(self):
+        now = self.clock.now()
+        for job in self.jobs:
+            job.schedule(now, self.rng, inclusive=True)
+
+        while not self.stopping and (self.until is None or now < self.until):
+            if not in_operating_hours(now):
+                wake = next_opening(now)
+                print(f"[{now:%Y-%m-%d %H:%M}] Outside operating hours; sleeping until {wake:%Y-%m-%d %H:%M}")
+                for job in self.jobs:
+                    job.schedule(wake, self.rng, inclusive=True)
+                self.clock.sleep((wake - now).total_seconds())
+                now = self.clock.now()
+                continue
+
+            for job in self.jobs:
+                if self.stopping:
+                    break
+                if job.due <= now:
+                    self.run_job(job, now)
+                    now = self.clock.now()
+
+            next_due = min(job.due for job in self.jobs)
+            self.clock.sleep((next_due - self.clock.now()).total_seconds())
+            now = self.clock.now()
+        print("Daemon stopped.")
+
+# ================= COLLECTOR JOBS =================
+
+class CollectorState:
+    """Latest values from each source, shared between jobs."""
+    def __init__(self):
+        self.weather = None         # (time, {origin_coordinate: flags})
+        self.cameras = None         # (time, {camera: concentration})
+
+    @staticmethod
+    def fresh(entry, now, max_age):
+        if entry and (now - entry[0]).total_seconds() <= max_age:
+            return entry[1]
+        return None
+
+def warm_up():
+    """Loads the model, zone masks, calendar and HTTP clients once for the life of the process."""
+    from detector import get_model
+    from frame_fetcher import get_fetcher
+    from holiday_calendar import load_calendar
+    from traffic_collector import traffic_provider
+    from weather_service import get_session
+    from zone_masks import load_zone
+
+    for step in (get_model, load_calendar, get_fetcher, get_session, traffic_provider,
+                 lambda: [load_zone(c['ref']) for c in CAMERA_MAP.values()]):
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up step failed: {e}")
+
+def collector_jobs(state, camera_interval=CAMERA_INTERVAL, weather_interval=WEATHER_INTERVAL, jitter=JITTER):
+    from concurrent.futures import ThreadPoolExecutor
+    import traffic_collector
+    from instrumentation import metrics
+    from weather_service import get_route_weather
+
+    pool = ThreadPoolExecutor(max_workers=traffic_collector.MAX_WORKERS)
+    cameras = route_cameras(ROUTES)
+    metrics.reset()                 # the first slot cycle starts after warm-up
+
+    def refresh_weather(now):
+        # The interval is shorter than the cron-oriented WEATHER_CACHE_TTL, so always refetch
+        state.weather = (now, get_route_weather(ROUTES, force_refresh=True))
+        print(f"[{now:%H:%M:%S}] Weather refreshed for {len(state.weather[1])} origins")
+
+    def refresh_cameras(now):
+        # Cameras poll just before the boundary; archived frames are recorded for the coming slot
+        state.cameras = (now, traffic_collector.collect_cameras(cameras, pool, now, slot=next_slot(now)))
+        print(f"[{now:%H:%M:%S}] Cameras: {state.cameras[1]}")
+
+    def collect_slot(now):
+        from dashboard_summary import update_summaries
+        try:
+            traffic_collector.main(
+                kl_now=now,
+                weather=state.fresh(state.weather, now, weather_interval * 1.5),
+                camera_results=state.fresh(state.cameras, now, camera_interval * 1.5),
+                reset_metrics=False,
+            )
+            update_summaries()
+        finally:
+            # Each slot's metrics file covers the refreshes since the previous slot, plus the slot
+            metrics.reset()
+
+    # Sources refresh first so a slot due at the same moment sees their new values
+    return [
+        Job('weather', weather_interval, refresh_weather, jitter),
+        Job('cameras', camera_interval, refresh_cameras, jitter),
+        Job('slot', SLOT_INTERVAL, collect_slot),
+    ]
+
+def dry_run_jobs(camera_interval=CAMERA_INTERVAL, weather_interval=WEATHER_INTERVAL, jitter=JITTER):
+    """Jobs that only log, for exercising the scheduler offline."""
+    def log(name):
+        return lambda now: print(f"[{now:%Y-%m-%d %H:%M:%S}] {name}")
+    return [
+        Job('weather', weather_interval, log('weather'), jitter),
+        Job('cameras', camera_interval, log('cameras'), jitter),
+        Job('slot', SLOT_INTERVAL, log('slot')),
+    ]
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Resident traffic collector")
+    parser.add_argument('--fake-clock', type=datetime.fromisoformat, metavar='ISO_TIME',
+                        help="start a simulated KL clock at this time (sleeps return instantly)")
+    parser.add_argument('--until', type=datetime.fromisoformat, metavar='ISO_TIME',
+                        help="stop once the clock reaches this KL time")
+    parser.add_argument('--dry-run', action='store_true', help="log jobs instead of collecting")
+    parser.add_argument('--camera-interval', type=int, default=CAMERA_INTERVAL)
+    parser.add_argument('--weather-interval', type=int, default=WEATHER_INTERVAL)
+    parser.add_argument('--jitter', type=int, default=JITTER)
+    parser.add_argument('--seed', type=int, help="seed for jitter (reproducible fake-clock runs)")
+    args = parser.parse_args(argv)
+
+    clock = FakeClock(args.fake_clock) if args.fake_clock else SystemClock()
+    intervals = dict(camera_interval=args.camera_interval, weather_interval=args.weather_interval, jitter=args.jitter)
+    if args.dry_run:
+        jobs = dry_run_jobs(**intervals)
+    else:
+        warm_up()
+        jobs = collector_jobs(CollectorState(), **intervals)
+
+    daemon = CollectorDaemon(clock, jobs, until=args.until, seed=args.seed)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.loop()
+    return daemon
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,186 @@
+"""Pre-aggregated JSON summaries for the dashboard (index.html).
+
+Run after each collection. Only Parquet files not yet summarised are read from the
+partitioned store, and only the days they belong to are rewritten. A day whose
+partition was rewritten (compaction, frame replay) is rebuilt from scratch.
+
+    summary/index.json          dates, per-route slot averages, jam rates, camera counts
+    summary/days/YYYY-MM-DD.json  one day's journey times, jams and camera levels per slot,
+                                  plus its share of the running sums and the files it covers
+    summary/state.json          running sums and the files already summarised
+"""
+import os
+import json
+from datetime import datetime
+
+# ================= CONFIGURATION =================
+SUMMARY_DIR = os.environ.get('SUMMARY_DIR', 'summary')
+DATE_FMT = "%d.%m.%y"
+LEVELS = ['LIGHT', 'MODERATE', 'HEAVY']
+
+# ================= HELPERS =================
+
+def _load_json(path, default):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return default
+
+def _write_atomic(path, write, mode='w'):
+    """Calls write(file) on a temporary file, then moves it over path, so readers never see a half-written file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, mode) as f:
+        write(f)
+    os.replace(tmp, path)
+
+def _write_json(path, data):
+    """Writes compact JSON atomically, so the dashboard never sees a half-written file."""
+    _write_atomic(path, lambda f: json.dump(data, f, separators=(',', ':'), sort_keys=True))
+
+def day_file(date_str):
+    """'24.03.26' -> 'days/2026-03-24.json' (relative to SUMMARY_DIR)."""
+    return f"days/{datetime.strptime(date_str, DATE_FMT):%Y-%m-%d}.json"
+
+def route_cameras():
+    """{'origin -> destination': camera name} for routes with an active camera."""
+    from traffic_collector import ROUTES, route_camera
+    return {f"{r['origin_location']} -> {r['destination_location']}": route_camera(r)
+            for r in ROUTES if route_camera(r)}
+
+def _merge(into, other, sign=1):
+    """Adds (sign=1) or subtracts (sign=-1) nested running totals: dicts of dicts, [sum, count] pairs or counts."""
+    for key, value in other.items():
+        if isinstance(value, dict):
+            _merge(into.setdefault(key, {}), value, sign)
+        elif isinstance(value, list):
+            total = into.setdefault(key, [0] * len(value))
+            for k, v in enumerate(value):
+                total[k] += sign * v
+        else:
+            into[key] = into.get(key, 0) + sign * value
+
+# ================= PIPELINE =================
+
+def partitions(root=None):
+    """{'YYYY-MM-DD': [Parquet file paths, oldest first]} for every stored day."""
+    from traffic_storage import STORAGE_DIR, partition_files
+
+    days = {}
+    for path in partition_files(root or STORAGE_DIR):
+        day = os.path.basename(os.path.dirname(path)).split('=', 1)[1]
+        days.setdefault(day, []).append(path)
+    return days
+
+def prepare(df, cameras):
+    """Adds the route, minutes, level and camera columns the summaries are built from."""
+    df['route'] = df['origin_location'].astype(str) + ' -> ' + df['destination_location'].astype(str)
+    df['timestamp'] = df['timestamp'].astype(int)
+    df['minutes'] = df['calculated_journeytime_minute'].astype(int)
+    df['is_Jam'] = df['is_Jam'].astype(int)
+    df['level'] = df['origin_VehicleConcentration'].astype(str)
+    df['camera'] = df['route'].map(cameras)
+    return df
+
+def totals(df):
+    """Running-total contributions of some rows (same maths as processData in index.html)."""
+    sums, jams, counts = {}, {}, {}
+    for (route, stamp), (s, c) in df.groupby(['route', 'timestamp'])['minutes'].agg(['sum', 'count']).iterrows():
+        sums.setdefault(route, {})[str(stamp)] = [int(s), int(c)]
+    for route, (j, c) in df.groupby('route')['is_Jam'].agg(['sum', 'count']).iterrows():
+        jams[route] = [int(j), int(c)]
+    cam_rows = df[df['camera'].notna() & df['level'].isin(LEVELS)]
+    for (camera, level), n in cam_rows.groupby(['camera', 'level']).size().items():
+        counts.setdefault(camera, dict.fromkeys(LEVELS, 0))[level] += int(n)
+    return {'sums': sums, 'jams': jams, 'cameras': counts}
+
+def update_summaries(root=None, out_dir=SUMMARY_DIR):
+    """Folds newly written Parquet files into the JSON summaries. Returns the number of rows read.
+
+    state.json remembers which files of each day partition have been summarised. New files
+    are added on top; if a summarised file disappeared (compaction, replay, a re-run rewrite),
+    that day is subtracted and rebuilt from its current files.
+
+    Day files are written first and state.json last. A day file that doesn't cover exactly
+    the files state.json lists for it (an interrupted run, a deleted file) means the running
+    sums can't be trusted, so everything is rebuilt.
+    """
+    from traffic_storage import read_files
+
+    state_path = os.path.join(out_dir, 'state.json')
+    empty = {'files': {}, 'dates': [], 'sums': {}, 'jams': {}, 'cameras': {}}
+    state = _load_json(state_path, empty)
+    if 'files' not in state:
+        print("Summary state predates file tracking; rebuilding.")
+        state = empty
+    for day, done in state['files'].items():
+        date_str = f"{datetime.strptime(day, '%Y-%m-%d'):{DATE_FMT}}"
+        summary = _load_json(os.path.join(out_dir, day_file(date_str)), {})
+        if sorted(summary.get('files', [])) != sorted(done):
+            print(f"Summary for {day} doesn't match the state; rebuilding.")
+            state = empty
+            break
+    cameras = route_cameras()
+
+    read = 0
+    for day, paths in partitions(root).items():
+        names = [os.path.basename(p) for p in paths]
+        done = set(state['files'].get(day, []))
+        if done == set(names):
+            continue
+        date_str = f"{datetime.strptime(day, '%Y-%m-%d'):{DATE_FMT}}"
+        path = os.path.join(out_dir, day_file(date_str))
+        summary = _load_json(path, None) if done else None
+        rebuild = summary is None or not done <= set(names)
+        if rebuild:
+            if summary is not None:
+                # Take the day's old contribution back out before recounting it
+                _merge(state, summary['totals'], sign=-1)
+            summary = {'date': date_str, 'journey': {}, 'jam': {}, 'concentration': {},
+                       'totals': {'sums': {}, 'jams': {}, 'cameras': {}}}
+            paths_to_read = paths
+        else:
+            paths_to_read = [p for p, n in zip(paths, names) if n not in done]
+
+        df = prepare(read_files(paths_to_read), cameras)
+        read += len(df)
+        added = totals(df)
+        _merge(state, added)
+        _merge(summary['totals'], added)
+        # Later files overwrite earlier values for the same slot
+        for row in df[['route', 'timestamp', 'minutes', 'is_Jam', 'camera', 'level']].itertuples(index=False):
+            stamp = str(row.timestamp)
+            summary['journey'].setdefault(row.route, {})[stamp] = row.minutes
+            summary['jam'].setdefault(row.route, {})[stamp] = row.is_Jam
+            if isinstance(row.camera, str) and row.level in LEVELS:
+                summary['concentration'].setdefault(row.camera, {})[stamp] = row.level
+        summary['files'] = names
+        _write_json(path, summary)
+        state['files'][day] = names
+        if date_str not in state['dates']:
+            state['dates'].append(date_str)
+        print(f"{'Rebuilt' if rebuild and done else 'Updated'} {day}: {len(df)} rows from {len(paths_to_read)} file(s)")
+
+    if not read:
+        print("Summaries up to date.")
+        return 0
+
+    state['dates'].sort(key=lambda d: datetime.strptime(d, DATE_FMT))
+    # Small index the dashboard loads first
+    index = {
+        'dates': state['dates'],
+        'days': {d: day_file(d) for d in state['dates']},
+        'averages': {route: {stamp: round(s / c, 2) for stamp, (s, c) in slots.items() if c}
+                     for route, slots in state['sums'].items()},
+        'jam_rate': {route: round(j / c, 4) for route, (j, c) in state['jams'].items() if c},
+        'concentration': state['cameras'],
+    }
+    _write_json(os.path.join(out_dir, 'index.json'), index)
+    # Last, so an interrupted run is detected (see above) rather than counted twice
+    _write_json(state_path, state)
+    return read
+
+if __name__ == "__main__":
+    update_summaries()
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import threading
+import cv2
+import numpy as np
+
+# ================= CONFIGURATION =================
+# Frames are letterboxed to YOLO_IMGSZ x YOLO_IMGSZ and sent to the model
+# YOLO_BATCH_SIZE at a time (all five cameras fit in one call by default).
+YOLO_IMGSZ = int(os.environ.get('YOLO_IMGSZ', 640))
+YOLO_BATCH_SIZE = int(os.environ.get('YOLO_BATCH_SIZE', 8))
+YOLO_CONF = 0.25
+
+# Inference backend: 'pt' (PyTorch), 'onnx' (ONNX Runtime) or 'openvino'.
+# Exported backends are lighter on a CPU-only runner; create them once with
+#   python detector.py --export onnx
+# If the exported model is missing or fails to load, the .pt weights are used.
+YOLO_WEIGHTS = os.environ.get('YOLO_WEIGHTS', 'yolo11n.pt')
+YOLO_BACKEND = os.environ.get('YOLO_BACKEND', 'pt')
+
+# The model is not safe to call from several threads at once
+model_lock = threading.Lock()
+
+_model = None
+
+# ================= MODEL =================
+
+def exported_path(backend, weights=YOLO_WEIGHTS):
+    """Where ultralytics writes the exported model for a backend."""
+    stem = os.path.splitext(weights)[0]
+    if backend == 'onnx':
+        return f"{stem}.onnx"
+    if backend == 'openvino':
+        return f"{stem}_openvino_model"
+    return weights
+
+def export_model(backend, weights=YOLO_WEIGHTS, imgsz=YOLO_IMGSZ):
+    """Exports the .pt weights to a CPU inference backend with a dynamic batch axis."""
+    from ultralytics import YOLO
+    return YOLO(weights).export(format=backend, imgsz=imgsz, dynamic=True)
+
+def get_model():
+    """Returns the process-wide YOLO model, loading it on first use."""
+    global _model
+    with model_lock:
+        if _model is None:
+            from ultralytics import YOLO
+            start = time.perf_counter()
+            path = exported_path(YOLO_BACKEND)
+            if YOLO_BACKEND != 'pt':
+                if os.path.exists(path):
+                    try:
+                        _model = YOLO(path, task='detect')
+                    except Exception as e:
+                        print(f"Could not load {path} ({e}). Falling back to {YOLO_WEIGHTS}.")
+                else:
+                    print(f"No exported {YOLO_BACKEND} model at {path}. Falling back to {YOLO_WEIGHTS}.")
+            if _model is None:
+                path = YOLO_WEIGHTS
+                _model = YOLO(path)
+            print(f"Loaded {path} in {time.perf_counter() - start:.2f}s")
+        return _model
+
+# ================= LETTERBOX =================
+
+def letterbox(img, size=YOLO_IMGSZ, color=(114, 114, 114)):
+    """Resizes img to fit a size x size canvas, keeping aspect ratio. Returns (canvas, scale, (pad_x, pad_y))."""
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    if (new_w, new_h) != (w, h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    if img.ndim == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    elif img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), color, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = img
+    return canvas, scale, (pad_x, pad_y)
+
+def unletterbox_boxes(boxes, scale, pad):
+    """Maps xyxy boxes from letterboxed coordinates back to the original frame."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4).copy()
+    boxes[:, [0, 2]] -= pad[0]
+    boxes[:, [1, 3]] -= pad[1]
+    return boxes / scale
+
+# ================= INFERENCE =================
+
+def detect_batch(model, frames, imgsz=YOLO_IMGSZ, batch_size=YOLO_BATCH_SIZE, conf=YOLO_CONF):
+    """Runs YOLO on a list of frames in batches. Returns one xyxy box array per frame, in frame coordinates."""
+    boxes = []
+    for start in range(0, len(frames), batch_size):
+        chunk = [letterbox(f, imgsz) for f in frames[start:start + batch_size]]
+        with model_lock:
+            results = model([c[0] for c in chunk], imgsz=imgsz, verbose=False, conf=conf)
+        for (_, scale, pad), res in zip(chunk, results):
+            boxes.append(unletterbox_boxes(res.boxes.xyxy.cpu().numpy(), scale, pad))
+    return boxes
+
+def detect_single(model, frame, imgsz=YOLO_IMGSZ, conf=YOLO_CONF):
+    """Runs YOLO on one frame (the old per-camera path, kept for benchmarks)."""
+    with model_lock:
+        results = model(frame, imgsz=imgsz, verbose=False, conf=conf)
+    return results[0].boxes.xyxy.cpu().numpy()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == '--export':
+        print(f"Exported to {export_model(sys.argv[2])}")
+    else:
+        print("Usage: python detector.py --export {onnx,openvino}")
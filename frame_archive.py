@@ -0,0 +1,236 @@
+"""Archive of raw camera frames, and replay of archived frames through YOLO.
+
+Layout: data/frames/day=YYYY-MM-DD/<sha1>.jpg, plus index.csv (captured KL time, camera, sha1,
+and the date and timestamp of the slot the frame was collected for)
+
+Frames are kept as the JPEG bytes the camera served. Bytes already archived that day are
+only indexed again, not stored twice.
+
+Usage:
+    ARCHIVE_FRAMES=1 python traffic_collector.py                    # archive while collecting
+    python frame_archive.py replay 2026-03-01 2026-03-31 [--workers N] [--dry-run]
+"""
+import os
+import csv
+import glob
+import time
+import hashlib
+import argparse
+import threading
+from datetime import date
+
+# ================= CONFIGURATION =================
+FRAME_ARCHIVE_DIR = os.environ.get('FRAME_ARCHIVE_DIR', os.path.join('data', 'frames'))
+INDEX_FILE = 'index.csv'
+PARTITION_KEY = 'day'
+
+# A slot is re-analysed with the last frame recorded for it. Index rows written before
+# slots were recorded fall back to the first frame captured from SLOT_LEAD seconds before
+# the slot started (the daemon polls just ahead of the boundary) until the next slot
+SLOT_MINUTES = 30
+SLOT_LEAD = 60
+
+_archive_lock = threading.Lock()
+
+# ================= ARCHIVE =================
+
+def partition_dir(day, root=FRAME_ARCHIVE_DIR):
+    return os.path.join(root, f"{PARTITION_KEY}={day:%Y-%m-%d}")
+
+def slot_timestamp(when):
+    """HHMM timestamp of the half-hour slot a KL datetime falls in, as in the stored rows."""
+    return when.hour * 100 + (30 if when.minute >= 30 else 0)
+
+def archive_frame(camera_name, content, captured, root=FRAME_ARCHIVE_DIR, slot=None):
+    """Stores a camera JPEG captured at a KL datetime and indexes it. Returns its SHA-1, or None on error.
+
+    slot is a KL datetime in the collection slot the frame is used for, if known.
+    """
+    digest = hashlib.sha1(content).hexdigest()
+    day_dir = partition_dir(captured.date(), root)
+    try:
+        with _archive_lock:
+            os.makedirs(day_dir, exist_ok=True)
+            blob = os.path.join(day_dir, f"{digest}.jpg")
+            if not os.path.exists(blob):
+                tmp = blob + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp, blob)
+            with open(os.path.join(day_dir, INDEX_FILE), 'a', newline='') as f:
+                slot_cols = [f"{slot:%Y-%m-%d}", slot_timestamp(slot)] if slot else ['', '']
+                csv.writer(f).writerow([f"{captured:%H:%M:%S}", camera_name, digest, *slot_cols])
+    except OSError as e:
+        print(f"Frame archive error for {camera_name}: {e}")
+        return None
+    return digest
+
+def read_index(day, root=FRAME_ARCHIVE_DIR):
+    """One day's archived frames: captured (seconds after midnight), camera, sha1, slot_date, slot.
+
+    slot_date and slot (HHMM) are empty for frames indexed without their slot.
+    """
+    import pandas as pd
+
+    columns = ['captured', 'camera', 'sha1', 'slot_date', 'slot']
+    path = os.path.join(partition_dir(day, root), INDEX_FILE)
+    if not os.path.exists(path):
+        return pd.DataFrame({c: pd.Series(dtype='int64' if c == 'captured' else str) for c in columns})
+    # Older index files have only the first three columns; the slot columns then read as ''
+    index = pd.read_csv(path, names=['time', 'camera', 'sha1', 'slot_date', 'slot'], dtype=str,
+                        keep_default_na=False)
+    index['captured'] = pd.to_timedelta(index['time']).dt.total_seconds().astype('int64')
+    return index[columns]
+
+def archived_days(root=FRAME_ARCHIVE_DIR, start=None, end=None):
+    """Days (datetime.date) in [start, end] that have an archive partition."""
+    from datetime import datetime
+
+    days = []
+    for day_dir in sorted(glob.glob(os.path.join(root, f"{PARTITION_KEY}=*"))):
+        day = datetime.strptime(os.path.basename(day_dir).split('=', 1)[1], "%Y-%m-%d").date()
+        if not ((start and day < start) or (end and day > end)):
+            days.append(day)
+    return days
+
+def slot_frames(rows, index, day):
+    """Adds a sha1 column to one day's rows: the frame that represents each row's camera and slot.
+
+    rows needs 'camera' and 'timestamp' (HHMM) columns. Rows without a suitable frame get NaN.
+    """
+    import pandas as pd
+
+    stamps = rows['timestamp'].astype(int)
+    keys = pd.DataFrame({'row': rows.index, 'camera': rows['camera'], 'slot': stamps,
+                         'slot_start': ((stamps // 100) * 60 + stamps % 100) * 60})
+    keys = keys.dropna(subset=['camera']).astype({'camera': str})
+
+    # The frame each slot was actually written from: the last one recorded for it
+    recorded = index[index['slot_date'] == f"{day:%Y-%m-%d}"].sort_values('captured')
+    recorded = recorded.assign(slot=recorded['slot'].astype(int)).drop_duplicates(['camera', 'slot'], keep='last')
+    exact = keys.merge(recorded[['camera', 'slot', 'sha1']], on=['camera', 'slot'])
+
+    # Frames indexed without their slot: the first capture around the start of the slot
+    legacy = index[index['slot'] == ''].sort_values('captured')
+    nearby = pd.merge_asof(keys.assign(after=keys['slot_start'] - SLOT_LEAD).sort_values('after'), legacy,
+                           left_on='after', right_on='captured', by='camera', direction='forward',
+                           tolerance=SLOT_MINUTES * 60 - 1)
+
+    sha1 = exact.set_index('row')['sha1'].combine_first(nearby.set_index('row')['sha1'])
+    return rows.assign(sha1=sha1)
+
+# ================= REPLAY =================
+
+def _init_worker(threads):
+    """Pool initializer: caps intra-op threads and loads this worker's own model."""
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from detector import get_model
+    get_model()
+
+def _analyze_chunk(chunk):
+    """[(day_dir, camera, sha1)] -> [(day_dir, camera, sha1, concentration)], in one batched YOLO call."""
+    import cv2
+    from detector import detect_batch, get_model
+    from traffic_collector import CAMERA_MAP, concentration_level
+    from zone_masks import load_zone
+
+    results, ready = [], []
+    for day_dir, camera, digest in chunk:
+        zone = load_zone(CAMERA_MAP[camera]['ref']) if camera in CAMERA_MAP else None
+        frame = cv2.imread(os.path.join(day_dir, f"{digest}.jpg"), cv2.IMREAD_COLOR)
+        if zone is None or frame is None:
+            results.append((day_dir, camera, digest, "NA"))
+        else:
+            ready.append(((day_dir, camera, digest), zone, frame))
+    if ready:
+        all_boxes = detect_batch(get_model(), [frame for _, _, frame in ready])
+        for (key, zone, _), boxes in zip(ready, all_boxes):
+            results.append((*key, concentration_level(zone, boxes)))
+    return results
+
+def replay(start, end, root=None, archive=FRAME_ARCHIVE_DIR, workers=None, batch_size=None, dry_run=False):
+    """Recomputes origin_VehicleConcentration for stored rows in [start, end] from archived frames.
+
+    Each distinct frame is analysed once, by a pool of worker processes that each hold one
+    model and run batched inference. Rows without an archived frame keep their value.
+    Returns (frames analysed, rows changed, seconds).
+    """
+    import multiprocessing
+    import pandas as pd
+    from detector import YOLO_BATCH_SIZE
+    from traffic_collector import ROUTES, route_camera
+    from traffic_storage import STORAGE_DIR, partition_dir as row_partition_dir, read_rows, replace_partition
+
+    root = root or STORAGE_DIR
+    workers = workers or os.cpu_count()
+    batch_size = batch_size or YOLO_BATCH_SIZE
+    cameras = {(r['origin_location'], r['destination_location']): route_camera(r) for r in ROUTES}
+
+    days = {}
+    for day in archived_days(archive, start, end):
+        rows = read_rows(root, start=day, end=day)
+        if rows.empty:
+            continue
+        rows['camera'] = [cameras.get(k) for k in zip(rows['origin_location'].astype(str),
+                                                        rows['destination_location'].astype(str))]
+        days[day] = slot_frames(rows, read_index(day, archive), day)
+
+    jobs = sorted({(partition_dir(day, archive), cam, digest)
+                   for day, rows in days.items()
+                   for cam, digest in rows[['camera', 'sha1']].dropna().itertuples(index=False)})
+    chunks = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+    print(f"{len(jobs)} distinct frames for {sum(r['sha1'].notna().sum() for r in days.values())} rows "
+          f"over {len(days)} days; {workers} workers, batch size {batch_size}")
+
+    levels = {}
+    started = time.perf_counter()
+    if chunks:
+        # spawn: each worker starts clean and loads its own model (no torch state shared over fork)
+        ctx = multiprocessing.get_context('spawn')
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(threads,)) as pool:
+            for results in pool.imap_unordered(_analyze_chunk, chunks):
+                for day_dir, camera, digest, level in results:
+                    levels[(day_dir, camera, digest)] = level
+    elapsed = time.perf_counter() - started
+
+    changed = 0
+    for day, rows in days.items():
+        day_dir = partition_dir(day, archive)
+        new = [levels.get((day_dir, cam, digest)) if isinstance(digest, str) else None
+               for cam, digest in zip(rows['camera'], rows['sha1'])]
+        new = pd.Series(new, index=rows.index)
+        old = rows['origin_VehicleConcentration'].astype(str)
+        updated = new.notna() & (new != old)
+        changed += int(updated.sum())
+        if updated.any() and not dry_run:
+            rows['origin_VehicleConcentration'] = old.where(~updated, new)
+            replace_partition(row_partition_dir(day, root), rows.drop(columns=['camera', 'sha1']))
+    return len(jobs), changed, elapsed
+
+# ================= CLI =================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archived camera frames")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('replay', help=replay.__doc__.splitlines()[0])
+    p.add_argument('start', type=date.fromisoformat)
+    p.add_argument('end', type=date.fromisoformat)
+    p.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    p.add_argument('--batch-size', type=int, help="frames per inference call (default: YOLO_BATCH_SIZE)")
+    p.add_argument('--dry-run', action='store_true', help="report changes without rewriting storage")
+    args = parser.parse_args(argv)
+
+    frames, changed, seconds = replay(args.start, args.end, workers=args.workers,
+                                      batch_size=args.batch_size, dry_run=args.dry_run)
+    rate = frames / seconds if seconds else 0
+    print(f"Analysed {frames} frames in {seconds:.2f}s ({rate:.1f} frames/s)")
+    print(f"{changed} rows {'would change' if args.dry_run else 'updated'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+# ================= CONFIGURATION =================
+FETCH_TIMEOUT = 10
+# Opt-in: a decoded frame whose perceptual hash differs from the last analysed frame by at
+# most this many bits (out of PHASH_SIZE * PHASH_SIZE) reuses the last concentration. The
+# 16x16 hash can miss a single car, so by default (-1) only a 304 or identical bytes count
+# as unchanged.
+PHASH_SIZE = 16
+PHASH_THRESHOLD = int(os.environ.get('PHASH_THRESHOLD', -1))
+# Connections kept open per camera host
+POOL_SIZE = 8
+
+# ================= HASHING =================
+
+def perceptual_hash(frame, size=PHASH_SIZE):
+    """Difference hash: sign of horizontal gradients on a size x size grayscale thumbnail."""
+    import cv2
+    import numpy as np
+
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    return np.packbits(thumb[:, 1:] > thumb[:, :-1])
+
+def hash_distance(a, b):
+    import numpy as np
+    return int(np.unpackbits(np.bitwise_xor(a, b)).sum())
+
+# ================= FETCHER =================
+
+class FetchedFrame:
+    """Result of polling one camera.
+
+    changed is False when the camera has not refreshed since the last analysed frame
+    (304, identical bytes, or a near-identical perceptual hash); frame is then None
+    unless it was decoded for the perceptual check. content holds the JPEG bytes the
+    camera is currently serving: the downloaded bytes, or the last ones on a 304.
+    """
+    def __init__(self, frame=None, changed=True, reason="", content=None):
+        self.frame = frame
+        self.changed = changed
+        self.reason = reason
+        self.content = content
+
+class CameraState:
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        self.digest = None          # SHA-1 of the last JPEG bytes
+        self.content = None         # the last JPEG bytes themselves (re-archived while unchanged)
+        self.phash = None           # perceptual hash of the last analysed frame
+        self.level = None           # concentration computed for that frame
+
+class FrameFetcher:
+    """Polls camera JPEGs over pooled per-host sessions with conditional GETs and change detection."""
+    def __init__(self, retries=3, backoff=0.5, phash_threshold=PHASH_THRESHOLD):
+        self.retries = retries
+        self.backoff = backoff
+        self.phash_threshold = phash_threshold
+        self.sessions = {}
+        self.cameras = {}
+        self.lock = threading.Lock()
+
+    def session(self, url):
+        """One keep-alive session per host (the c10/c12.fgies.com cameras share two)."""
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.sessions:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3 import Retry
+                # Same retry policy as retry-requests, on a larger connection pool
+                retry = Retry(total=self.retries, backoff_factor=self.backoff,
+                              status_forcelist=(500, 502, 504), allowed_methods=None)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self.sessions[host] = session
+            return self.sessions[host]
+
+    def state(self, camera_name):
+        with self.lock:
+            return self.cameras.setdefault(camera_name, CameraState())
+
+    def fetch(self, camera_name, url):
+        """Polls a camera. Returns a FetchedFrame, or None if the request or decode failed."""
+        import cv2
+        import numpy as np
+        from instrumentation import metrics
+
+        state = self.state(camera_name)
+        headers = {}
+        if state.level is not None:
+            # Only ask "has it changed?" once there is a result to fall back on
+            if state.etag:
+                headers['If-None-Match'] = state.etag
+            if state.last_modified:
+                headers['If-Modified-Since'] = state.last_modified
+        try:
+            with metrics.stage('camera_fetch'):
+                resp = self.session(url).get(url, headers=headers, timeout=FETCH_TIMEOUT)
+        except Exception as e:
+            metrics.incr('camera_fetch_errors')
+            print(f"Camera fetch error for {camera_name}: {e}")
+            return None
+
+        if resp.status_code == 304:
+            metrics.incr('camera_unchanged')
+            return FetchedFrame(changed=False, reason="not modified", content=state.content)
+        if resp.status_code != 200:
+            metrics.incr('camera_fetch_errors')
+            print(f"Camera fetch error for {camera_name}: Status {resp.status_code}")
+            return None
+
+        state.etag = resp.headers.get('ETag')
+        state.last_modified = resp.headers.get('Last-Modified')
+        content = resp.content
+        digest = hashlib.sha1(content).hexdigest()
+        if state.level is not None and digest == state.digest:
+            metrics.incr('camera_unchanged')
+            return FetchedFrame(changed=False, reason="same bytes", content=content)
+        state.digest, state.content = digest, content
+
+        # Decode straight from the response buffer (no bytearray copy)
+        with metrics.stage('camera_decode'):
+            frame = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            metrics.incr('camera_fetch_errors')
+            return None
+
+        if self.phash_threshold >= 0:
+            phash = perceptual_hash(frame)
+            if (state.level is not None and state.phash is not None
+                    and hash_distance(phash, state.phash) <= self.phash_threshold):
+                metrics.incr('camera_unchanged')
+                return FetchedFrame(frame, changed=False, reason="same scene", content=content)
+            state.phash = phash
+        return FetchedFrame(frame, changed=True, content=content)
+
+    def cached_level(self, camera_name):
+        """Concentration from the last analysed frame, or None."""
+        return self.state(camera_name).level
+
+    def remember(self, camera_name, level):
+        """Stores the concentration computed for the latest changed frame."""
+        state = self.state(camera_name)
+        if level == "NA":
+            # Don't let a failed analysis be reused; force a full fetch next time
+            state.level = state.digest = state.content = state.phash = None
+        else:
+            state.level = level
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+def get_fetcher():
+    """Process-wide fetcher, so sessions and per-camera hashes survive between polls."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = FrameFetcher()
+        return _fetcher
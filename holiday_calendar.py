@@ -0,0 +1,111 @@
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+
+# ================= CONFIGURATION =================
+HOLIDAY_FILE = 'HList_KL.txt'
+
+# Flag bits stored per date
+PUBLIC = 1
+SCHOOL = 2
+FESTIVE = 4
+
+DATE_FMT = "%d.%m.%y"
+# "dd.mm.yy" optionally followed by " - dd.mm.yy" for a range
+DATE_RE = re.compile(r'(\d{2}\.\d{2}\.\d{2})(?:\s*-\s*(\d{2}\.\d{2}\.\d{2}))?')
+
+_EPOCH = date(1970, 1, 1)
+
+# ================= CALENDAR INDEX =================
+
+class HolidayCalendar:
+    """Holiday flags per date, parsed once from the holiday list with ranges expanded."""
+    def __init__(self, flags):
+        # flags: {datetime.date: PUBLIC | SCHOOL | FESTIVE bits}
+        self.flags = flags
+        # Sorted day numbers (days since 1970-01-01) and their flags, for vectorized lookups
+        self.days = sorted((d - _EPOCH).days for d in flags)
+        self.day_flags = [flags[_EPOCH + timedelta(days=n)] for n in self.days]
+
+    @classmethod
+    def parse(cls, lines):
+        flags = {}
+        mode = None  # "PUBLIC" or "SCH"
+        for line in lines:
+            line = line.strip()
+            if "PUBLIC HOLIDAY" in line:
+                mode = "PUBLIC"
+                continue
+            elif "SCHOOL HOLIDAY" in line or line.startswith("SCH"):
+                mode = "SCH"
+                continue
+            if mode is None:
+                continue
+
+            if mode == "PUBLIC":
+                bits = PUBLIC | (FESTIVE if "FESTIVE" in line.upper() else 0)
+            else:
+                bits = SCHOOL
+            # Only the date list before the first ' : ' describes dates
+            for first, last in DATE_RE.findall(line.split(' : ')[0]):
+                start = datetime.strptime(first, DATE_FMT).date()
+                end = datetime.strptime(last, DATE_FMT).date() if last else start
+                for n in range((end - start).days + 1):
+                    d = start + timedelta(days=n)
+                    flags[d] = flags.get(d, 0) | bits
+        return cls(flags)
+
+    def lookup(self, day):
+        """Returns (is_holiday, is_school_holiday, is_festive) for a date or datetime."""
+        if isinstance(day, datetime):
+            day = day.date()
+        bits = self.flags.get(day, 0)
+        return int(bool(bits & PUBLIC)), int(bool(bits & SCHOOL)), int(bool(bits & FESTIVE))
+
+    def label(self, dates):
+        """Labels a whole pandas column of dates at once.
+
+        Accepts datetimes or 'dd.mm.yy' strings (the format main() writes). Returns a
+        DataFrame with int8 is_Holiday, is_SchoolHoliday and is_Festive columns.
+        """
+        import numpy as np
+        import pandas as pd
+
+        dates = pd.Series(dates)
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, format=DATE_FMT, errors='coerce')
+        day_numbers = dates.dt.floor('D').to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+        known = np.asarray(self.days, dtype=np.int64)
+        bits = np.zeros(len(day_numbers), dtype=np.int8)
+        if len(known):
+            pos = np.clip(np.searchsorted(known, day_numbers), 0, len(known) - 1)
+            hit = (known[pos] == day_numbers) & dates.notna().to_numpy()
+            bits[hit] = np.asarray(self.day_flags, dtype=np.int8)[pos[hit]]
+
+        return pd.DataFrame({
+            'is_Holiday': ((bits & PUBLIC) > 0).astype(np.int8),
+            'is_SchoolHoliday': ((bits & SCHOOL) > 0).astype(np.int8),
+            'is_Festive': ((bits & FESTIVE) > 0).astype(np.int8),
+        }, index=dates.index)
+
+# ================= CACHE =================
+
+_cache = {}
+_lock = threading.Lock()
+
+def load_calendar(path=HOLIDAY_FILE):
+    """Returns the parsed calendar, re-reading the file only when its mtime changes."""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with _lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        if mtime is None:
+            calendar = HolidayCalendar({})
+        else:
+            with open(path, 'r') as f:
+                calendar = HolidayCalendar.parse(f)
+        _cache[path] = (mtime, calendar)
+        return calendar
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# ================= CONFIGURATION =================
+# Written after every run. A .prom path is written in Prometheus textfile format
+# (for node_exporter's textfile collector), anything else as JSON.
+METRICS_FILE = os.environ.get('COLLECTOR_METRICS', 'collector_metrics.json')
+PROMETHEUS_PREFIX = 'traffic_collector'
+
+# ================= METRICS =================
+
+class Metrics:
+    """Per-run stage timers, per-route timers and counters. Safe to use from worker threads.
+
+    Stage times are wall time spent inside each stage; stages that run concurrently overlap,
+    so they can add up to more than the run's total.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.perf_counter()
+            self.stages = {}        # name -> [total seconds, calls]
+            self.routes = {}        # label -> seconds
+            self.counters = {}      # name -> count (or seconds for *_seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def route(self, label, seconds):
+        with self.lock:
+            self.routes[label] = seconds
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'total_seconds': round(time.perf_counter() - self.started, 4),
+                'stages': {k: {'seconds': round(s, 4), 'calls': c} for k, (s, c) in sorted(self.stages.items())},
+                'routes': {k: round(v, 4) for k, v in self.routes.items()},
+                'counters': {k: round(v, 4) if isinstance(v, float) else v for k, v in sorted(self.counters.items())},
+            }
+
+    def prometheus(self):
+        """Snapshot in Prometheus text exposition format."""
+        snap = self.snapshot()
+        p = PROMETHEUS_PREFIX
+        lines = [f"# TYPE {p}_run_seconds gauge", f"{p}_run_seconds {snap['total_seconds']}",
+                 f"# TYPE {p}_stage_seconds gauge", f"# TYPE {p}_stage_calls gauge"]
+        for name, s in snap['stages'].items():
+            lines.append(f'{p}_stage_seconds{{stage="{name}"}} {s["seconds"]}')
+            lines.append(f'{p}_stage_calls{{stage="{name}"}} {s["calls"]}')
+        lines.append(f"# TYPE {p}_route_seconds gauge")
+        for label, secs in snap['routes'].items():
+            escaped = label.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{p}_route_seconds{{route="{escaped}"}} {secs}')
+        lines.append(f"# TYPE {p}_events gauge")
+        for name, value in snap['counters'].items():
+            lines.append(f'{p}_events{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=METRICS_FILE):
+        """Writes the snapshot atomically (so a scraper never reads half a file)."""
+        if not path:
+            return
+        body = self.prometheus() if path.endswith('.prom') else json.dumps(self.snapshot(), indent=2)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+# Process-wide metrics for the current run
+metrics = Metrics()
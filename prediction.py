@@ -0,0 +1,338 @@
+"""Journey-time prediction: feature encoding, a small NumPy MLP and the precomputed forecast.
+
+Usage:
+    python prediction.py train                     # fit on data/traffic, save models/traffic_mlp.npz
+    python prediction.py forecast [--hours 48]     # score every route x slot, write summary/forecast.json
+
+The forecast covers every route in ROUTES for each half-hour collection slot in the
+next --hours hours. It is scored in one matrix pass, and index.html reads it for the
+Tomorrow and Day After views.
+"""
+import os
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+
+# ================= CONFIGURATION =================
+MODEL_PATH = os.environ.get('PREDICTION_MODEL', os.path.join('models', 'traffic_mlp.npz'))
+FORECAST_HOURS = 48
+FORECAST_FILE = 'forecast.json'
+
+# Network and training
+HIDDEN_LAYERS = (32, 16)
+EPOCHS = 30
+BATCH_SIZE = 256
+LEARNING_RATE = 1e-3
+SEED = 0
+# The most recent rows are held out to report validation error
+VALIDATION_SHARE = 0.1
+
+# Vocabularies are fixed, so the same column always lands in the same place whatever the
+# training data covers. Unknown values encode as all zeros.
+DAY_NAMES = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+MONTHS = ['JANUARY', 'FEBRUARY', 'MARCH', 'APRIL', 'MAY', 'JUNE', 'JULY',
+          'AUGUST', 'SEPTEMBER', 'OCTOBER', 'NOVEMBER', 'DECEMBER']
+LEVELS = ['NA', 'LIGHT', 'MODERATE', 'HEAVY']
+FLAG_FEATURES = ['is_PeakHour', 'origin_Raining', 'origin _ClearVisibility', 'origin_Windy', 'origin_Hot',
+                 'is_Holiday', 'is_SchoolHoliday', 'is_Festive']
+TARGET = 'calculated_journeytime_minute'
+# Observed at collection time, so forecasts use each route's typical value for the slot
+CONDITION_KEYS = ['origin_location', 'destination_location', 'timestamp']
+CONDITION_COLUMNS = ['origin_VehicleConcentration', 'origin_Raining', 'origin _ClearVisibility',
+                     'origin_Windy', 'origin_Hot']
+
+# ================= ENCODING =================
+
+def route_key(origin, destination):
+    """Same 'origin -> destination' key the dashboard uses."""
+    return f"{origin} -> {destination}"
+
+class FeatureEncoder:
+    """Turns rows in the traffic_data.csv layout into a float32 feature matrix.
+
+    Categorical columns are one-hot encoded against fixed vocabularies. The 0/1 flag
+    columns are copied as they are, and the slot time becomes three continuous features.
+    """
+    def __init__(self, vocabularies):
+        self.vocabularies = vocabularies        # {column: [values]}
+        self.offsets = {}
+        width = 0
+        for col, values in vocabularies.items():
+            self.offsets[col] = width
+            width += len(values)
+        self.flag_offset = width
+        self.width = width + len(FLAG_FEATURES) + 3
+
+    @classmethod
+    def default(cls):
+        from traffic_collector import ROUTES
+        return cls({
+            'route': [route_key(r['origin_location'], r['destination_location']) for r in ROUTES],
+            'direction': sorted({r['direction'] for r in ROUTES}),
+            'time_of_day': ['DAY', 'NIGHT'],
+            'day_name': DAY_NAMES,
+            'type_of_day': ['WEEKDAY', 'WEEKEND'],
+            'month': MONTHS,
+            'origin_VehicleConcentration': LEVELS,
+        })
+
+    def transform(self, df):
+        import numpy as np
+        import pandas as pd
+
+        n = len(df)
+        X = np.zeros((n, self.width), dtype=np.float32)
+        rows = np.arange(n)
+        columns = {col: df[col].astype(str) for col in self.vocabularies if col != 'route'}
+        columns['route'] = df['origin_location'].astype(str) + ' -> ' + df['destination_location'].astype(str)
+        for col, values in self.vocabularies.items():
+            codes = pd.Categorical(columns[col], categories=values).codes
+            known = codes >= 0
+            X[rows[known], self.offsets[col] + codes[known]] = 1
+
+        X[:, self.flag_offset:self.flag_offset + len(FLAG_FEATURES)] = (
+            df[FLAG_FEATURES].apply(pd.to_numeric).to_numpy(dtype=np.float32))
+
+        # Slot time: position within the 0800-2130 day, plus its phase on a 24h circle
+        stamps = pd.to_numeric(df['timestamp']).to_numpy()
+        minutes = (stamps // 100) * 60 + stamps % 100
+        angle = 2 * np.pi * minutes / (24 * 60)
+        X[:, -3] = (minutes - 8 * 60) / (13.5 * 60)
+        X[:, -2] = np.sin(angle)
+        X[:, -1] = np.cos(angle)
+        return X
+
+# ================= MODEL =================
+
+class MLP:
+    """Fully connected ReLU network predicting journey minutes. Inference is plain NumPy matmuls."""
+    def __init__(self, weights, biases, y_mean=0.0, y_std=1.0):
+        self.weights = weights
+        self.biases = biases
+        self.y_mean = y_mean
+        self.y_std = y_std
+
+    @classmethod
+    def initialise(cls, n_inputs, hidden=HIDDEN_LAYERS, seed=SEED):
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        sizes = [n_inputs, *hidden, 1]
+        # He initialisation for the ReLU layers
+        weights = [(rng.standard_normal((a, b)) * np.sqrt(2 / a)).astype(np.float32)
+                   for a, b in zip(sizes[:-1], sizes[1:])]
+        biases = [np.zeros(b, dtype=np.float32) for b in sizes[1:]]
+        return cls(weights, biases)
+
+    def forward(self, X):
+        """Returns the activations of every layer; the last is the (standardised) output."""
+        import numpy as np
+
+        activations = [X]
+        for W, b in zip(self.weights[:-1], self.biases[:-1]):
+            activations.append(np.maximum(activations[-1] @ W + b, 0))
+        activations.append(activations[-1] @ self.weights[-1] + self.biases[-1])
+        return activations
+
+    def predict(self, X):
+        """Journey minutes for every row of X, in one pass."""
+        return self.forward(X)[-1][:, 0] * self.y_std + self.y_mean
+
+    def fit(self, X, y, epochs=EPOCHS, batch_size=BATCH_SIZE, learning_rate=LEARNING_RATE, seed=SEED):
+        """Minibatch Adam on mean squared error against the standardised target."""
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        self.y_mean, self.y_std = float(y.mean()), float(y.std() or 1.0)
+        target = ((y - self.y_mean) / self.y_std).astype(np.float32)[:, None]
+        params = self.weights + self.biases
+        m = [np.zeros_like(p) for p in params]
+        v = [np.zeros_like(p) for p in params]
+        beta1, beta2, eps, step = 0.9, 0.999, 1e-8, 0
+
+        for _ in range(epochs):
+            order = rng.permutation(len(X))
+            for start in range(0, len(X), batch_size):
+                batch = order[start:start + batch_size]
+                acts = self.forward(X[batch])
+                delta = 2 * (acts[-1] - target[batch]) / len(batch)
+                grads_w, grads_b = [], []
+                for layer in range(len(self.weights) - 1, -1, -1):
+                    grads_w.append(acts[layer].T @ delta)
+                    grads_b.append(delta.sum(axis=0))
+                    if layer:
+                        delta = (delta @ self.weights[layer].T) * (acts[layer] > 0)
+                grads = grads_w[::-1] + grads_b[::-1]
+
+                step += 1
+                for p, g, m_p, v_p in zip(params, grads, m, v):
+                    m_p *= beta1
+                    m_p += (1 - beta1) * g
+                    v_p *= beta2
+                    v_p += (1 - beta2) * g * g
+                    p -= learning_rate * (m_p / (1 - beta1 ** step)) / (np.sqrt(v_p / (1 - beta2 ** step)) + eps)
+        return self
+
+def save_model(model, encoder, path=MODEL_PATH, **info):
+    import numpy as np
+    from dashboard_summary import _write_atomic
+
+    meta = {'vocabularies': encoder.vocabularies, 'y_mean': model.y_mean, 'y_std': model.y_std, **info}
+    arrays = {f"w{i}": w for i, w in enumerate(model.weights)}
+    arrays.update({f"b{i}": b for i, b in enumerate(model.biases)})
+    _write_atomic(path, lambda f: np.savez(f, meta=json.dumps(meta), **arrays), mode='wb')
+
+def load_model(path=MODEL_PATH):
+    """Returns (model, encoder, meta) saved by save_model."""
+    import numpy as np
+
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        layers = sum(1 for k in data.files if k.startswith('w'))
+        weights = [data[f"w{i}"] for i in range(layers)]
+        biases = [data[f"b{i}"] for i in range(layers)]
+    return MLP(weights, biases, meta['y_mean'], meta['y_std']), FeatureEncoder(meta['vocabularies']), meta
+
+# ================= TRAINING =================
+
+def typical_conditions(df):
+    """Most frequent camera level and weather flags for every route and slot in the stored rows.
+
+    Returns records [origin, destination, timestamp, level, raining, clear, windy, hot], all
+    strings. 'NA' levels (no camera, or a failed frame) only win when nothing else was seen.
+    """
+    rows = df[CONDITION_KEYS + CONDITION_COLUMNS].astype(str)
+    rows['origin_VehicleConcentration'] = rows['origin_VehicleConcentration'].where(
+        rows['origin_VehicleConcentration'] != 'NA')
+
+    def most_frequent(values):
+        counts = values.value_counts()
+        return counts.index[0] if len(counts) else 'NA'
+    typical = rows.groupby(CONDITION_KEYS, sort=True)[CONDITION_COLUMNS].agg(most_frequent)
+    return typical.reset_index().values.tolist()
+
+def train(df=None, path=MODEL_PATH, epochs=EPOCHS):
+    """Fits the MLP on stored rows that have a journey time, saves it and returns (model, encoder)."""
+    import numpy as np
+    from traffic_storage import read_rows
+
+    history = read_rows() if df is None else df
+    df = history[(history['data_Pass'].astype(int) == 1) & (history[TARGET].astype(int) > 0)]
+    if df.empty:
+        raise ValueError("No rows with journey times to train on")
+
+    encoder = FeatureEncoder.default()
+    X = encoder.transform(df)
+    y = df[TARGET].to_numpy(dtype=np.float32)
+    # Rows are stored oldest first, so the tail is the most recent data
+    split = len(X) - int(len(X) * VALIDATION_SHARE)
+    start = time.perf_counter()
+    model = MLP.initialise(encoder.width).fit(X[:split], y[:split], epochs=epochs)
+    elapsed = time.perf_counter() - start
+
+    message = f"Trained on {split} rows in {elapsed:.1f}s: MAE {np.abs(model.predict(X[:split]) - y[:split]).mean():.2f} min"
+    if split < len(X):
+        message += f", validation MAE {np.abs(model.predict(X[split:]) - y[split:]).mean():.2f} min on {len(X) - split} rows"
+    print(message)
+    if split < len(X):
+        # The held-out rows are the most recent, which matter most for the forecast: the
+        # saved model is refit on every row, with the settings just validated
+        model = MLP.initialise(encoder.width).fit(X, y, epochs=epochs)
+        print(f"Refit on all {len(X)} rows")
+    save_model(model, encoder, path, trained_rows=len(X), trained_at=datetime.now().isoformat(timespec='seconds'),
+               conditions=typical_conditions(history))
+    return model, encoder
+
+# ================= FORECAST =================
+
+def forecast_slots(start, hours=FORECAST_HOURS):
+    """KL datetimes of the collection slots (0800-2130, every 30 minutes) after start, within hours."""
+    from traffic_collector import in_operating_hours
+
+    slot = start.replace(minute=0 if start.minute < 30 else 30, second=0, microsecond=0) + timedelta(minutes=30)
+    end = start + timedelta(hours=hours)
+    slots = []
+    while slot <= end:
+        if in_operating_hours(slot):
+            slots.append(slot)
+        slot += timedelta(minutes=30)
+    return slots
+
+def forecast_grid(start, hours=FORECAST_HOURS, conditions=None):
+    """Every route x every upcoming slot, as rows in the traffic_data.csv layout.
+
+    Time and holiday columns are exactly what main() would write for the slot. Weather
+    and camera levels are unknown ahead of time, so each route takes its typical values
+    for the slot (conditions, from typical_conditions), then its typical values over all
+    slots, and only then the defaults ('NA' camera, DEFAULT_WEATHER).
+    """
+    import pandas as pd
+    from traffic_collector import ROUTES, slot_fields
+    from weather_service import DEFAULT_WEATHER
+
+    slots = pd.DataFrame([slot_fields(s) for s in forecast_slots(start, hours)])
+    if slots.empty:
+        return slots
+    grid = slots.merge(pd.DataFrame(ROUTES), how='cross')
+
+    typical = pd.DataFrame(conditions or [], columns=CONDITION_KEYS + CONDITION_COLUMNS, dtype=str)
+    route_keys = CONDITION_KEYS[:2]
+    by_route = typical.groupby(route_keys)[CONDITION_COLUMNS].agg(lambda v: v.value_counts().index[0])
+    grid = grid.merge(typical, on=CONDITION_KEYS, how='left')
+    grid = grid.fillna(grid[route_keys].merge(by_route, on=route_keys, how='left'))
+    defaults = dict(zip(CONDITION_COLUMNS, ['NA', *DEFAULT_WEATHER]))
+    return grid.fillna({col: str(value) for col, value in defaults.items()})
+
+def forecast(start=None, hours=FORECAST_HOURS, path=MODEL_PATH, out_dir=None):
+    """Scores the whole forecast grid in one pass and writes it to summary/forecast.json. Returns the grid."""
+    import numpy as np
+    from dashboard_summary import SUMMARY_DIR, _write_json
+    from traffic_collector import ROUTES, kl_time
+
+    start = start or kl_time()
+    model, encoder, meta = load_model(path)
+    grid = forecast_grid(start, hours, meta.get('conditions'))
+    if grid.empty:
+        print("No collection slots in the forecast window.")
+        return grid
+    grid['minutes'] = np.round(np.clip(model.predict(encoder.transform(grid)), 0, None), 1)
+
+    dates = {}
+    for (date_str, origin, destination), part in grid.groupby(['date', 'origin_location', 'destination_location'], sort=False):
+        dates.setdefault(date_str, {})[route_key(origin, destination)] = dict(
+            zip(part['timestamp'].astype(str), part['minutes'].astype(float)))
+    table = {
+        'generated': start.isoformat(timespec='minutes'),
+        'hours': hours,
+        'trained_at': meta.get('trained_at'),
+        'dates': dates,
+    }
+
+    out_path = os.path.join(out_dir or SUMMARY_DIR, FORECAST_FILE)
+    _write_json(out_path, table)
+    print(f"Wrote {len(grid)} predictions ({len(grid) // len(ROUTES)} slots x {len(ROUTES)} routes) to {out_path}")
+    return grid
+
+# ================= CLI =================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Journey-time prediction")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('train', help=train.__doc__)
+    p.add_argument('--epochs', type=int, default=EPOCHS)
+    p = sub.add_parser('forecast', help=forecast.__doc__)
+    p.add_argument('--hours', type=int, default=FORECAST_HOURS)
+    p.add_argument('--start', type=datetime.fromisoformat, metavar='ISO_TIME', help="KL time to forecast from (default: now)")
+    p.add_argument('--retrain', action='store_true', help="train first, even if a model is saved")
+    args = parser.parse_args(argv)
+
+    if args.command == 'train':
+        train(epochs=args.epochs)
+    else:
+        if args.retrain or not os.path.exists(MODEL_PATH):
+            train()
+        forecast(start=args.start, hours=args.hours)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Scheduler behaviour of collector_daemon, driven by the offline FakeClock."""
+from datetime import datetime, timedelta
+
+from collector_daemon import SLOT_INTERVAL, CollectorDaemon, FakeClock, Job
+
+DAY = datetime(2026, 3, 24)
+
+def at(hour, minute=0, second=0, day=DAY):
+    return day.replace(hour=hour, minute=minute, second=second)
+
+def recording_job(name, interval, jitter=0, action=None):
+    job = Job(name, interval, None, jitter)
+    job.times = []
+
+    def record(now):
+        job.times.append(now)
+        if action:
+            action(now)
+    job.action = record
+    return job
+
+def test_slots_run_on_half_hour_boundaries():
+    slot = recording_job('slot', SLOT_INTERVAL)
+    CollectorDaemon(FakeClock(at(7, 50)), [slot], until=at(9, 1), seed=1).loop()
+    assert slot.times == [at(8), at(8, 30), at(9)]
+
+def test_jittered_jobs_fire_before_their_boundary():
+    cameras = recording_job('cameras', 600, jitter=20)
+    slot = recording_job('slot', SLOT_INTERVAL)
+    CollectorDaemon(FakeClock(at(8, 0, 1)), [cameras, slot], until=at(9, 0, 1), seed=7).loop()
+
+    # Boundaries 08:10 ... 09:00, each run up to 20 s early but never late
+    assert len(cameras.times) == 6
+    for n, ran in enumerate(cameras.times, start=1):
+        boundary = at(8) + timedelta(minutes=10 * n)
+        assert boundary - timedelta(seconds=20) <= ran <= boundary
+    assert slot.times == [at(8, 30), at(9)]
+
+def test_jobs_due_together_run_in_list_order():
+    order = []
+    weather = recording_job('weather', 900, action=lambda now: order.append('weather'))
+    slot = recording_job('slot', SLOT_INTERVAL, action=lambda now: order.append('slot'))
+    CollectorDaemon(FakeClock(at(8)), [weather, slot], until=at(8, 0, 1)).loop()
+    assert order == ['weather', 'slot']
+
+def test_sleeps_through_closed_hours():
+    slot = recording_job('slot', SLOT_INTERVAL)
+    clock = FakeClock(at(22, 10))
+    CollectorDaemon(clock, [slot], until=at(8, 1, day=DAY + timedelta(days=1))).loop()
+    assert slot.times == [at(8, day=DAY + timedelta(days=1))]
+
+def test_stall_is_caught_up_once():
+    clock = FakeClock(at(7, 50))
+
+    def stall(now):
+        if now == at(8):
+            clock.sleep(95 * 60)    # first run overruns by more than three intervals
+    slot = recording_job('slot', SLOT_INTERVAL, action=stall)
+    CollectorDaemon(clock, [slot], until=at(10, 1)).loop()
+
+    # 08:30, 09:00 and 09:30 were missed: one catch-up at 09:35, then back on the boundaries
+    assert slot.times == [at(8), at(9, 35), at(10)]
+    assert slot.runs == 3
+
+def test_stop_finishes_current_job_and_exits():
+    clock = FakeClock(at(7, 50))
+    daemon = None
+
+    def stop_on_second_run(now):
+        if len(slot.times) == 2:
+            daemon.stop()
+    slot = recording_job('slot', SLOT_INTERVAL, action=stop_on_second_run)
+    later = recording_job('later', SLOT_INTERVAL)
+    daemon = CollectorDaemon(clock, [slot, later])
+    daemon.loop()
+
+    assert slot.times == [at(8), at(8, 30)]
+    # The job queued behind the stopping one is skipped
+    assert later.times == [at(8)]
+    assert clock.stop_event.is_set()
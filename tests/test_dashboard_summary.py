@@ -0,0 +1,96 @@
+"""Incremental summaries stay equal to a recount of the whole store."""
+import json
+import os
+import shutil
+from datetime import date
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+
+from benchmark import synthetic_history
+from dashboard_summary import LEVELS, route_cameras, update_summaries
+from traffic_storage import compact, read_rows, replace_partition, write_rows
+
+DAY1, DAY2 = date(2026, 1, 5), date(2026, 1, 6)
+HISTORY = synthetic_history(2)
+
+def run_rows(day, stamp, seed=None):
+    """The rows one collection run writes: every route for one slot (re-runs get new values)."""
+    rows = HISTORY[(HISTORY['date'] == f"{day:%d.%m.%y}") & (HISTORY['timestamp'] == stamp)].copy()
+    if seed is not None:
+        rows['calculated_journeytime_minute'] = (rows['calculated_journeytime_minute'] + seed) % 40 + 1
+        rows['is_Jam'] = 1 - rows['is_Jam']
+    return rows
+
+def recount(root):
+    df = read_rows(root)
+    route = df['origin_location'].astype(str) + ' -> ' + df['destination_location'].astype(str)
+    minutes = df['calculated_journeytime_minute'].astype(int)
+    averages = {}
+    for (r, stamp), m in minutes.groupby([route, df['timestamp'].astype(int)]):
+        averages.setdefault(r, {})[str(stamp)] = round(m.mean(), 2)
+    jams = df['is_Jam'].astype(int).groupby(route).mean().round(4).to_dict()
+    cameras = {}
+    level = df['origin_VehicleConcentration'].astype(str)
+    for (camera, lv), n in level.groupby([route.map(route_cameras()), level]).size().items():
+        if lv in LEVELS:
+            cameras.setdefault(camera, dict.fromkeys(LEVELS, 0))[lv] = int(n)
+    return averages, jams, cameras
+
+def assert_matches_recount(root, out_dir):
+    with open(os.path.join(out_dir, 'index.json')) as f:
+        index = json.load(f)
+    averages, jams, cameras = recount(root)
+    assert index['averages'] == averages
+    assert index['jam_rate'] == jams
+    assert index['concentration'] == cameras
+
+@pytest.fixture
+def store(tmp_path):
+    return str(tmp_path / 'traffic'), str(tmp_path / 'summary')
+
+def test_runs_rewrites_and_compaction_match_a_recount(store):
+    root, out_dir = store
+    for day, stamp in [(DAY1, 800), (DAY1, 830), (DAY2, 800)]:
+        write_rows(run_rows(day, stamp), root)
+    per_run = len(run_rows(DAY1, 800))
+    assert update_summaries(root, out_dir) == 3 * per_run
+    assert_matches_recount(root, out_dir)
+
+    # Nothing new
+    assert update_summaries(root, out_dir) == 0
+
+    # A re-run of a slot adds a file; only that file is read
+    write_rows(run_rows(DAY2, 800, seed=7), root)
+    assert update_summaries(root, out_dir) == per_run
+    assert_matches_recount(root, out_dir)
+
+    # Compaction rewrites DAY1: the day is subtracted and recounted from its new file
+    assert compact(root, min_files=2, before=DAY2) == 1
+    assert update_summaries(root, out_dir) == 2 * per_run
+    assert_matches_recount(root, out_dir)
+
+    # So is a replay rewrite of the compacted day
+    rows = read_rows(root, start=DAY1, end=DAY1)
+    rows['origin_VehicleConcentration'] = rows['origin_VehicleConcentration'].astype(str).replace('LIGHT', 'HEAVY')
+    replace_partition(os.path.join(root, f"day={DAY1}"), rows)
+    assert update_summaries(root, out_dir) == 2 * per_run
+    assert_matches_recount(root, out_dir)
+
+def test_interrupted_run_is_rebuilt_not_double_counted(store):
+    root, out_dir = store
+    write_rows(run_rows(DAY1, 800), root)
+    update_summaries(root, out_dir)
+
+    # A run that wrote its day file but died before writing state.json
+    state = os.path.join(out_dir, 'state.json')
+    shutil.copy(state, state + '.before')
+    write_rows(run_rows(DAY1, 830), root)
+    update_summaries(root, out_dir)
+    os.replace(state + '.before', state)
+
+    write_rows(run_rows(DAY1, 900), root)
+    assert update_summaries(root, out_dir) == 3 * len(run_rows(DAY1, 800))
+    assert_matches_recount(root, out_dir)
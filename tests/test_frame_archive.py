@@ -0,0 +1,39 @@
+"""Matching archived frames to stored rows for replay."""
+from datetime import date, datetime, time
+
+import pandas as pd
+
+from frame_archive import archive_frame, read_index, slot_frames
+
+DAY = date(2026, 3, 24)
+
+def rows(*stamps, camera='SPE-02'):
+    return pd.DataFrame({'camera': [camera] * len(stamps), 'timestamp': [str(s) for s in stamps]})
+
+def capture(root, hhmmss, content, slot=None, camera='SPE-02'):
+    captured = datetime.strptime(f"{DAY} {hhmmss}", "%Y-%m-%d %H:%M:%S")
+    return archive_frame(camera, content, captured, root, slot=slot and datetime.combine(DAY, slot))
+
+def test_daemon_rows_use_the_frame_recorded_for_their_slot(tmp_path):
+    ten_to = capture(tmp_path, '08:19:44', b'a', slot=time(8, 30))
+    used = capture(tmp_path, '08:29:50', b'b', slot=time(8, 30))
+    nine = capture(tmp_path, '08:59:50', b'c', slot=time(9, 0))
+
+    matched = slot_frames(rows(830, 900), read_index(DAY, tmp_path), DAY)
+    assert ten_to != used
+    assert list(matched['sha1']) == [used, nine]
+
+def test_unrecorded_frames_match_the_capture_at_the_start_of_the_slot(tmp_path):
+    early = capture(tmp_path, '08:29:50', b'a')
+    capture(tmp_path, '08:59:50', b'b')
+    cron = capture(tmp_path, '09:31:05', b'c')
+
+    matched = slot_frames(rows(830, 930, 1000), read_index(DAY, tmp_path), DAY)
+    assert matched['sha1'].iloc[0] == early
+    assert matched['sha1'].iloc[1] == cron
+    assert pd.isna(matched['sha1'].iloc[2])
+
+def test_rows_without_a_camera_get_no_frame(tmp_path):
+    capture(tmp_path, '08:29:50', b'a', slot=None)
+    matched = slot_frames(rows(830, camera=None), read_index(DAY, tmp_path), DAY)
+    assert matched['sha1'].isna().all()
@@ -0,0 +1,84 @@
+"""Change detection in frame_fetcher, against a stubbed camera host."""
+import cv2
+
+from frame_fetcher import FrameFetcher
+
+REFERENCE = 'SPE-02-CAPTUREWITHINGREENLINE.jpg'
+
+class Response:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+class Camera:
+    """Serves queued responses and records the request headers."""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+def fetcher_for(camera, **kwargs):
+    fetcher = FrameFetcher(**kwargs)
+    fetcher.session = lambda url: camera
+    return fetcher
+
+def jpeg(frame):
+    return cv2.imencode('.jpg', frame)[1].tobytes()
+
+def test_unchanged_camera_still_returns_the_bytes_it_serves():
+    content = jpeg(cv2.imread(REFERENCE))
+    camera = Camera(Response(200, content, {'ETag': '"v1"'}), Response(304), Response(200, content))
+    fetcher = fetcher_for(camera)
+
+    first = fetcher.fetch('SPE-02', 'http://camera/SPE-02.jpg')
+    assert first.changed and first.content == content
+    fetcher.remember('SPE-02', 'LIGHT')
+
+    not_modified = fetcher.fetch('SPE-02', 'http://camera/SPE-02.jpg')
+    assert camera.requests[1]['If-None-Match'] == '"v1"'
+    assert not not_modified.changed and not_modified.content == content
+
+    same_bytes = fetcher.fetch('SPE-02', 'http://camera/SPE-02.jpg')
+    assert not same_bytes.changed and same_bytes.content == content
+
+def test_failed_analysis_is_not_reused():
+    content = jpeg(cv2.imread(REFERENCE))
+    camera = Camera(Response(200, content), Response(200, content))
+    fetcher = fetcher_for(camera)
+
+    fetcher.fetch('SPE-02', 'http://camera/SPE-02.jpg')
+    fetcher.remember('SPE-02', 'NA')
+    again = fetcher.fetch('SPE-02', 'http://camera/SPE-02.jpg')
+    assert again.changed and camera.requests[1] == {}
+
+def with_car(frame, y=113, x=78):
+    """The frame with one car-sized block pasted in; at (113, 78) the 16x16 dHash doesn't change."""
+    frame = frame.copy()
+    frame[y:y + 18, x:x + 30] = (40, 40, 200)
+    return frame
+
+def test_new_bytes_are_analysed_even_when_the_perceptual_hash_matches():
+    from frame_fetcher import hash_distance, perceptual_hash
+
+    reference = cv2.imread(REFERENCE)
+    assert hash_distance(perceptual_hash(reference), perceptual_hash(with_car(reference))) == 0
+    camera = Camera(Response(200, jpeg(reference)), Response(200, jpeg(with_car(reference))))
+    fetcher = fetcher_for(camera)
+
+    fetcher.fetch('SPE-02', 'http://camera/SPE-02.jpg')
+    fetcher.remember('SPE-02', 'LIGHT')
+    assert fetcher.fetch('SPE-02', 'http://camera/SPE-02.jpg').changed
+
+def test_perceptual_shortcut_is_opt_in():
+    reference = cv2.imread(REFERENCE)
+    camera = Camera(Response(200, jpeg(reference)), Response(200, jpeg(with_car(reference))))
+    fetcher = fetcher_for(camera, phash_threshold=0)
+
+    fetcher.fetch('SPE-02', 'http://camera/SPE-02.jpg')
+    fetcher.remember('SPE-02', 'LIGHT')
+    result = fetcher.fetch('SPE-02', 'http://camera/SPE-02.jpg')
+    assert not result.changed and result.reason == "same scene"
@@ -0,0 +1,40 @@
+"""Parsing and lookups of the holiday list."""
+from datetime import date, datetime
+
+import pytest
+
+from holiday_calendar import HOLIDAY_FILE, HolidayCalendar, load_calendar
+
+LINES = """PUBLIC HOLIDAY:
+23.03.26, 24.03.26 : Hari Raya Aidilfitri : FESTIVE
+01.05.26 : Labour Day
+
+SCHOOL HOLIDAY:
+20.03.26 - 28.03.26 : Term 1 Holidays
+""".splitlines()
+
+def test_ranges_are_expanded_and_flags_combined():
+    calendar = HolidayCalendar.parse(LINES)
+    assert calendar.lookup(date(2026, 3, 20)) == (0, 1, 0)
+    assert calendar.lookup(date(2026, 3, 24)) == (1, 1, 1)
+    assert calendar.lookup(date(2026, 3, 28)) == (0, 1, 0)
+    assert calendar.lookup(date(2026, 3, 29)) == (0, 0, 0)
+    assert calendar.lookup(datetime(2026, 5, 1, 8, 30)) == (1, 0, 0)
+
+def test_label_matches_lookup_and_zeroes_bad_dates():
+    pd = pytest.importorskip('pandas')
+    calendar = HolidayCalendar.parse(LINES)
+    labels = calendar.label(pd.Series(['24.03.26', '01.05.26', '02.05.26', 'not a date', None]))
+    assert labels.values.tolist() == [[1, 1, 1], [1, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]]
+
+    stamps = pd.Series(pd.to_datetime(['2026-03-21 08:30', None]))
+    assert calendar.label(stamps).values.tolist() == [[0, 1, 0], [0, 0, 0]]
+
+def test_empty_calendar_labels_nothing():
+    pd = pytest.importorskip('pandas')
+    labels = HolidayCalendar({}).label(pd.Series(['24.03.26']))
+    assert labels.values.tolist() == [[0, 0, 0]]
+
+def test_bundled_list_and_missing_file(tmp_path):
+    assert load_calendar(HOLIDAY_FILE).lookup(date(2026, 3, 24)) == (1, 1, 1)
+    assert load_calendar(str(tmp_path / 'missing.txt')).lookup(date(2026, 3, 24)) == (0, 0, 0)
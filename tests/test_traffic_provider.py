@@ -0,0 +1,64 @@
+"""Distance Matrix batching and partial results."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import traffic_collector
+from traffic_collector import ROUTES
+from traffic_provider import (MAX_DESTINATIONS, MAX_ELEMENTS, MAX_ORIGINS, FakeTrafficProvider,
+                              plan_batches, plan_dense_batches, plan_exact_batches)
+
+PAIRS = [(r['origin_coordinate'], r['destination_coordinate']) for r in ROUTES]
+
+def check_limits(batches):
+    for origins, dests, members in batches:
+        assert len(origins) <= MAX_ORIGINS and len(dests) <= MAX_DESTINATIONS
+        assert len(origins) * len(dests) <= MAX_ELEMENTS
+        assert set(members) <= {(o, d) for o in origins for d in dests}
+
+def test_exact_batches_bill_only_wanted_pairs():
+    batches = plan_batches(PAIRS, mode='exact')
+    check_limits(batches)
+    assert sum(len(o) * len(d) for o, d, _ in batches) == len(set(PAIRS)) == 28
+    assert sorted(p for _, _, members in batches for p in members) == sorted(set(PAIRS))
+
+def test_dense_batches_cover_every_pair_within_limits():
+    batches = plan_batches(PAIRS, mode='dense')
+    check_limits(batches)
+    assert sorted(p for _, _, members in batches for p in members) == sorted(set(PAIRS))
+
+def test_large_matrices_are_split_at_the_limits():
+    everything = [(f"o{i}", f"d{j}") for i in range(30) for j in range(30)]
+    for plan in (plan_exact_batches, plan_dense_batches):
+        batches = plan(everything)
+        check_limits(batches)
+        assert sorted(p for _, _, members in batches for p in members) == sorted(everything)
+
+def test_journey_times_are_cached_per_departure_bucket():
+    provider = FakeTrafficProvider()
+    departure = datetime(2026, 3, 24, 8, 5)
+    first = provider.journey_times(PAIRS, departure)
+    requests = provider.requests
+    assert provider.journey_times(PAIRS, departure) == first
+    assert provider.requests == requests and len(first) == 28
+
+def test_slow_request_only_loses_its_own_routes(monkeypatch):
+    class SlowLast(FakeTrafficProvider):
+        calls = 0
+
+        def query(self, origins, dests, departure_time):
+            SlowLast.calls += 1
+            if SlowLast.calls == len(plan_batches(PAIRS)):
+                time.sleep(1.5)
+            return super().query(origins, dests, departure_time)
+
+    provider = SlowLast()
+    monkeypatch.setattr(traffic_collector, 'traffic_provider', lambda: provider)
+    monkeypatch.setattr(traffic_collector, 'TASK_TIMEOUT', 0.5)
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        results = traffic_collector.submit_journey_times(ROUTES, pool)()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    slow = [members for _, _, members in plan_batches(PAIRS)][-1]
+    assert set(results) == set(PAIRS) - set(slow)
@@ -1,17 +1,22 @@
 import os
-import cv2
+import sys
 import time
-import requests
-import numpy as np
-import pandas as pd
-import googlemaps
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime, timedelta
-from ultralytics import YOLO
+
+from instrumentation import metrics
+
+# Heavy dependencies (cv2, numpy, pandas, googlemaps, torch/ultralytics) are imported
+# inside the functions that use them, so out-of-hours runs and tools that only need
+# ROUTES or check_holidays start instantly.
+START_TIME = time.perf_counter()
 
 # ================= CONFIGURATION =================
 # 1. API Keys (Set this in GitHub Secrets)
+# Set TRAFFIC_PROVIDER=fake to run offline with simulated journey times.
 GMAPS_KEY = os.environ.get('GOOGLE_MAPS_KEY')
-if not GMAPS_KEY:
+if not GMAPS_KEY and os.environ.get('TRAFFIC_PROVIDER') != 'fake':
     print("WARNING: No Google Maps API Key found. Traffic data will be empty.")
 
 # 2. Camera Configuration
@@ -70,176 +75,307 @@ ROUTES = [
     {'origin_location': 'GATE 4 (DAMANSARA GATE)', 'origin_coordinate': '3.137486, 101.658259', 'destination_location': 'GATE 1 (KL GATE)', 'destination_coordinate': '3.118774, 101.663074', 'direction': 'LEAVING', 'EG1': 0, 'LG1': 1, 'EG2': 0, 'LG2': 0, 'EG3': 0, 'LG3': 0, 'EG4': 0, 'LG4': 0, 'FSKTM': 0, 'active_CAM': 0}
 ]
 
+# 4. Collection Engine
+# Routes are collected concurrently. Set COLLECTOR_WORKERS=1 to fall back to serial collection.
+MAX_WORKERS = int(os.environ.get('COLLECTOR_WORKERS', 8))
+GOOGLE_QPS = 4.0         # Token bucket refill rate for Distance Matrix requests
+GOOGLE_BURST = 4         # Requests allowed back-to-back before throttling
+TASK_TIMEOUT = 30        # Seconds to wait on any single Google/camera/weather task
+
+# 5. Storage
+# Rows are always written to data/traffic/ (see traffic_storage.py). The single
+# traffic_data.csv is still appended for the dashboard unless WRITE_LEGACY_CSV=0. The
+# scheduled workflow sets 0 and rebuilds the CSV once a day with `traffic_storage.py export-csv`.
+WRITE_LEGACY_CSV = os.environ.get('WRITE_LEGACY_CSV', '1') == '1'
+# Set ARCHIVE_FRAMES=1 to keep every downloaded camera JPEG under data/frames/ (see
+# frame_archive.py), so concentrations can be recomputed with new thresholds or weights.
+ARCHIVE_FRAMES = os.environ.get('ARCHIVE_FRAMES', '0') == '1'
+
+# 6. Concentration thresholds (% of the green zone covered by vehicles)
+HEAVY_DENSITY = 60
+MODERATE_DENSITY = 40
+
 # ================= HELPER FUNCTIONS =================
 
+class TokenBucket:
+    """Thread-safe token bucket. acquire() blocks until a token is available."""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            metrics.incr('sleep_seconds', wait)
+            time.sleep(wait)
+
+google_limiter = TokenBucket(GOOGLE_QPS, GOOGLE_BURST)
+
 def check_holidays(current_date):
-    """Parses HList_KL.txt to check holiday status."""
-    is_holiday = 0
-    is_school_holiday = 0
-    is_festive = 0
-    
-    date_str = current_date.strftime("%d.%m.%y")
-    
+    """Looks up holiday status in the HList_KL.txt calendar (parsed once, re-read when the file changes)."""
+    from holiday_calendar import load_calendar
+
     try:
-        if os.path.exists('HList_KL.txt'):
-            with open('HList_KL.txt', 'r') as f:
-                lines = f.readlines()
-                
-            mode = None # "PUBLIC" or "SCH"
-            for line in lines:
-                line = line.strip()
-                if "PUBLIC HOLIDAY" in line:
-                    mode = "PUBLIC"
-                    continue
-                elif "SCHOOL HOLIDAY" in line or line.startswith("SCH"):
-                    mode = "SCH"
-                    continue
-                    
-                if mode == "PUBLIC":
-                    if date_str in line:
-                        is_holiday = 1
-                        if "FESTIVE" in line.upper():
-                            is_festive = 1
-                elif mode == "SCH":
-                    if date_str in line:
-                        is_school_holiday = 1
+        return load_calendar('HList_KL.txt').lookup(current_date)
     except Exception as e:
         print(f"Error reading holiday file: {e}")
-        
-    return is_holiday, is_school_holiday, is_festive
+        return 0, 0, 0
 
 def get_weather(lat, lon):
-    try:
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "current": "temperature_2m,weather_code,wind_speed_10m,visibility",
-            "timezone": "Asia/Singapore" # KL Time
-        }
-        # FIX: Added timeout=10 to prevent indefinite hanging
-        resp = requests.get(url, params=params, timeout=10)
-        
-        if resp.status_code != 200:
-            print(f"Weather API Error: Status {resp.status_code}")
-            return 0, 1, 0, 0
+    """(is_raining, is_clear, is_windy, is_hot) for one point."""
+    from weather_service import get_weather_many
+    return get_weather_many([(lat, lon)])[(lat, lon)]
 
-        data = resp.json()['current']
-        
-        # Rain: Codes 51-67, 80-82, 95-99
-        rain_codes = [51,53,55,61,63,65,66,67,80,81,82,95,96,99]
-        is_raining = 1 if data['weather_code'] in rain_codes else 0
-        
-        # Visibility: OpenMeteo gives meters. >10km is Clear.
-        is_clear = 1 if data['visibility'] >= 10000 else 0
-        
-        # Windy: > 20 km/h
-        is_windy = 1 if data['wind_speed_10m'] > 20 else 0
-        
-        # Hot: >= 30 C
-        is_hot = 1 if data['temperature_2m'] >= 30 else 0
-        
-        return is_raining, is_clear, is_windy, is_hot
-    except Exception as e:
-        print(f"Weather API Error: {e}")
-        return 0, 1, 0, 0 # Defaults
+def traffic_provider():
+    """Shared traffic provider (one Google client, rate limited), or None without a key."""
+    from traffic_provider import get_provider
+    return get_provider(GMAPS_KEY, limiter=google_limiter.acquire, timeout=TASK_TIMEOUT)
+
+def submit_journey_times(routes, pool=None):
+    """Starts the Distance Matrix requests for routes, as few as possible, one pool task each.
+
+    Returns a function that waits for them and returns {(origin, dest): (minutes, is_jam)}.
+    Each request is waited on for up to TASK_TIMEOUT, so a slow one only loses the routes
+    it covers. Without a pool the requests run one after another when the function is called.
+    """
+    provider = traffic_provider()
+    if provider is None: return dict
+    pairs = [(r['origin_coordinate'], r['destination_coordinate']) for r in routes]
+    departure, timings = datetime.now(), {}
+    start = time.perf_counter()
+    results, batches = provider.lookup(pairs, departure)
+    futures = [pool.submit(provider.fetch, batch, departure, timings) for batch in batches] if pool else []
+
+    def gather():
+        if pool is None:
+            for batch in batches:
+                results.update(provider.fetch(batch, departure, timings))
+        for i, future in enumerate(futures):
+            results.update(task_result(future, {}, f"traffic request {i + 1}/{len(futures)}"))
+        metrics.observe('traffic', time.perf_counter() - start)
+        # Per-route time is the round trip of the request that answered it (0 when cached or lost)
+        for r in routes:
+            pair = (r['origin_coordinate'], r['destination_coordinate'])
+            metrics.route(f"{r['origin_location']} -> {r['destination_location']}", timings.get(pair, 0.0))
+        return results
+    return gather
+
+def get_journey_times(routes):
+    """Journey time and jam flag for every route, in as few Distance Matrix requests as possible."""
+    return submit_journey_times(routes)()
 
 def get_traffic_google(origin, dest):
-    if not GMAPS_KEY: return 0, 0
-    
     try:
-        gmaps = googlemaps.Client(key=GMAPS_KEY)
-        # Using directions to get duration in traffic
-        now = datetime.now()
-        directions = gmaps.directions(origin, dest, mode="driving", departure_time=now)
-        
-        if directions:
-            leg = directions[0]['legs'][0]
-            duration_min = leg['duration']['value'] / 60
-            duration_traffic_min = leg.get('duration_in_traffic', leg['duration'])['value'] / 60
-            
-            # Jam Logic: If traffic makes it 25% slower than standard
-            is_jam = 1 if duration_traffic_min > (duration_min * 1.25) else 0
-            
-            return int(duration_traffic_min), is_jam
+        return get_journey_times([{'origin_coordinate': origin, 'destination_coordinate': dest}]).get((origin, dest), (0, 0))
     except Exception as e:
         print(f"Google Maps Error: {e}")
     return 0, 0
 
 # ================= YOLO TRAFFIC ANALYSIS =================
-# Load model once at start
-model = YOLO('yolo11n.pt') 
+# The model is loaded on first use and shared by the whole process (see detector.get_model).
+# Frames are polled by frame_fetcher.get_fetcher(), which keeps per-host sessions and skips unchanged images.
+
+def concentration_level(zone, boxes):
+    """Converts detected boxes into LIGHT/MODERATE/HEAVY for a camera zone."""
+    from zone_masks import zone_density
+
+    # In-zone area covered by vehicles, overlaps counted once
+    density = zone_density(zone, boxes)
+    if density is None: return "NA"
+    
+    if density >= HEAVY_DENSITY: return "HEAVY"
+    elif density >= MODERATE_DENSITY: return "MODERATE"
+    else: return "LIGHT"
+
+def analyze_frames(frames):
+    """Runs one batched YOLO inference over {camera_name: frame} and returns {camera_name: concentration}."""
+    from detector import detect_batch, get_model
+    from zone_masks import load_zone
+
+    levels = {}
+    ready = {}
+    for camera_name, frame in frames.items():
+        # Reference Mask (built once per reference image, then cached)
+        with metrics.stage('mask'):
+            zone = load_zone(CAMERA_MAP[camera_name]['ref']) if camera_name in CAMERA_MAP else None
+        if zone is None:
+            print(f"Missing reference image for {camera_name}")
+            levels[camera_name] = "NA"
+        elif frame is None:
+            levels[camera_name] = "NA"
+        else:
+            ready[camera_name] = (zone, frame)
+
+    if ready:
+        names = list(ready)
+        with metrics.stage('model_load'):
+            model = get_model()
+        with metrics.stage('yolo'):
+            all_boxes = detect_batch(model, [ready[n][1] for n in names])
+        with metrics.stage('density'):
+            for camera_name, boxes in zip(names, all_boxes):
+                levels[camera_name] = concentration_level(ready[camera_name][0], boxes)
+    return levels
 
 def analyze_camera_traffic(camera_name):
     if camera_name not in CAMERA_MAP:
         return "NA"
-    
-    conf = CAMERA_MAP[camera_name]
-    
-    # 1. Get Reference Mask
-    if not os.path.exists(conf['ref']):
-        print(f"Missing reference image for {camera_name}")
-        return "NA"
-    
-    # Generate Mask from Green Lines
-    ref_img = cv2.imread(conf['ref'])
-    hsv = cv2.cvtColor(ref_img, cv2.COLOR_BGR2HSV)
-    mask = cv2.inRange(hsv, np.array([40, 100, 100]), np.array([80, 255, 255]))
-    
-    # Fill Mask (Row-wise fill between lines)
-    filled_mask = np.zeros_like(mask)
-    for r in range(mask.shape[0]):
-        indices = np.where(mask[r, :] > 0)[0]
-        if len(indices) >= 2:
-            filled_mask[r, indices[0]:indices[-1]] = 255
-            
-    # 2. Fetch Live Image
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return collect_cameras([camera_name], pool)[camera_name]
+
+# ================= COLLECTION ENGINE =================
+
+def route_camera(route):
+    """Returns the CAMERA_MAP name analysed for a route, or None."""
+    if route['active_CAM'] != 1:
+        return None
+    cam_name = route['origin_location']
+    # If origin isn't a camera, check destination
+    if cam_name not in CAMERA_MAP and route['destination_location'] in CAMERA_MAP:
+        cam_name = route['destination_location']
+    return cam_name if cam_name in CAMERA_MAP else None
+
+def task_result(future, default, label):
+    """Waits up to TASK_TIMEOUT for a task, returning default on timeout or error."""
     try:
-        # Keep existing timeout=10 here
-        resp = requests.get(conf['url'], timeout=10)
-        arr = np.asarray(bytearray(resp.content), dtype=np.uint8)
-        frame = cv2.imdecode(arr, -1)
-    except:
-        return "NA"
-    
-    if frame is None:
-        return "NA"
+        return future.result(timeout=TASK_TIMEOUT)
+    except FutureTimeout:
+        metrics.incr('task_timeouts')
+        print(f"Timed out: {label}")
+    except Exception as e:
+        metrics.incr('task_failures')
+        print(f"Task failed: {label}: {e}")
+    return default
 
-    # 3. YOLO Detection
-    results = model(frame, verbose=False, conf=0.25)
-    
-    # 4. Calculate Density
-    total_zone_pixels = np.count_nonzero(filled_mask)
-    if total_zone_pixels == 0: return "NA"
-    
-    vehicle_area_pixels = 0
-    for box in results[0].boxes:
-        # Check if center is in zone
-        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-        cx, cy = int((x1+x2)/2), int((y1+y2)/2)
-        
-        if 0 <= cy < filled_mask.shape[0] and 0 <= cx < filled_mask.shape[1]:
-            if filled_mask[cy, cx] == 255:
-                vehicle_area_pixels += (x2-x1) * (y2-y1)
+def route_cameras(routes):
+    """Unique cameras analysed for a list of routes, in route order."""
+    cameras = []
+    for route in routes:
+        cam_name = route_camera(route)
+        if cam_name and cam_name not in cameras:
+            cameras.append(cam_name)
+    return cameras
 
-    density = (vehicle_area_pixels / total_zone_pixels) * 100
-    
-    if density >= 60: return "HEAVY"
-    elif density >= 40: return "MODERATE"
-    else: return "LIGHT"
+def collect_cameras(cameras, pool, now=None, slot=None):
+    """Polls camera frames in parallel, then runs one batched YOLO call. Returns {camera: concentration}.
+
+    Cameras whose image has not changed since the last analysed frame reuse that frame's result.
+    now (KL time) stamps archived frames; it defaults to the current KL time. slot (KL time) is
+    the collection slot the results are for, recorded with archived frames so replay uses them.
+    """
+    from frame_fetcher import get_fetcher
+
+    fetcher = get_fetcher()
+    fetch_futures = {cam: pool.submit(fetcher.fetch, cam, CAMERA_MAP[cam]['url']) for cam in cameras}
+    levels, frames = {}, {}
+    for cam, future in fetch_futures.items():
+        fetched = task_result(future, None, cam)
+        # Unchanged cameras are indexed again too, so replay has a frame for every slot
+        if ARCHIVE_FRAMES and fetched is not None and fetched.content is not None:
+            from frame_archive import archive_frame
+            with metrics.stage('archive'):
+                archive_frame(cam, fetched.content, now or kl_time(), slot=slot)
+        if fetched is not None and not fetched.changed and fetcher.cached_level(cam) is not None:
+            print(f"{cam}: unchanged ({fetched.reason}), reusing {fetcher.cached_level(cam)}")
+            levels[cam] = fetcher.cached_level(cam)
+        else:
+            frames[cam] = fetched.frame if fetched is not None else None
+
+    for cam, level in analyze_frames(frames).items():
+        fetcher.remember(cam, level)
+        levels[cam] = level
+        if level == "NA":
+            metrics.incr('camera_na')
+    return {cam: levels[cam] for cam in cameras}
+
+def collect_routes(routes, base, workers=MAX_WORKERS, weather=None, camera_results=None, slot=None):
+    """Builds one row per route. Rows are returned in the same order as routes.
+
+    weather / camera_results may be passed in when a caller (the daemon) already holds fresh values.
+    slot is the KL time the rows are for (see collect_cameras).
+    """
+    from weather_service import DEFAULT_WEATHER, get_route_weather
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        # Weather for every unique origin in ONE multi-location request (cached between runs)
+        if weather is None:
+            print("Fetching weather for route origins...")
+            weather_future = pool.submit(get_route_weather, routes)
+
+        # Unique origin/destination pairs are batched into Distance Matrix requests, each
+        # its own task, so one slow request doesn't cost the other requests' routes
+        gather_journey_times = submit_journey_times(routes, pool)
+
+        if weather is None:
+            weather = task_result(weather_future, {}, "weather")
+        # Each camera is analysed once, however many routes share it. All frames go
+        # through YOLO in one batched call while Google requests are still in flight.
+        if camera_results is None:
+            camera_results = collect_cameras(route_cameras(routes), pool, slot=slot)
+        journey_times = gather_journey_times()
+
+        rows = []
+        for i, route in enumerate(routes):
+            print(f"Processing route {i+1}/{len(routes)}: {route['origin_location']} -> {route['destination_location']}")
+            row = route.copy()
+            row.update(base)
+
+            # Weather at this route's origin
+            raining, clear, windy, hot = weather.get(route['origin_coordinate'], DEFAULT_WEATHER)
+            row['origin_Raining'] = raining
+            row['origin _ClearVisibility'] = clear
+            row['origin_Windy'] = windy
+            row['origin_Hot'] = hot
+
+            # Traffic (Google)
+            duration, is_jam = journey_times.get((route['origin_coordinate'], route['destination_coordinate']), (0, 0))
+            row['calculated_journeytime_minute'] = int(duration)
+            row['is_Jam'] = is_jam
+
+            # YOLO Analysis
+            cam_name = route_camera(route)
+            row['origin_VehicleConcentration'] = camera_results.get(cam_name, "NA") if cam_name else "NA"
+
+            # Data Pass: 1 if everything essential is there (API worked)
+            row['data_Pass'] = 1 if row['calculated_journeytime_minute'] > 0 else 0
+            if not row['data_Pass']:
+                metrics.incr('journey_na')
+
+            rows.append(row)
+            if i == 0:
+                print(f"Cold start: first row ready {time.perf_counter() - START_TIME:.2f}s after process start")
+        return rows
+    finally:
+        # Drop tasks that never started and return without waiting for running ones. A running
+        # request still finishes in the background (worker threads are joined at exit); its
+        # own timeout (FETCH_TIMEOUT, TASK_TIMEOUT for Google, 10 s for weather) bounds that.
+        pool.shutdown(wait=False, cancel_futures=True)
 
 # ================= MAIN EXECUTION =================
 
-def main():
-    # 1. Time Setup (KL Time)
+def kl_time():
+    """Current time in Kuala Lumpur (UTC+8)."""
     utc_now = datetime.utcnow()
-    kl_now = utc_now + timedelta(hours=8)
-    
-    # Ensure between 0800 and 2100
+    return utc_now + timedelta(hours=8)
+
+def in_operating_hours(kl_now):
+    """Collection runs between 0800 and 2100 (last slot 2130)."""
+    return 8 <= kl_now.hour <= 21
+
+def slot_fields(kl_now):
+    """Time, date and holiday columns shared by every row of one collection slot."""
     current_hour = kl_now.hour
-    if not (8 <= current_hour <= 21):
-        print(f"Current time {kl_now} is outside operating hours (0800-2100). Exiting.")
-        return
 
     # Round to nearest 30 mins for timestamp label
     minute = kl_now.minute
@@ -247,7 +383,7 @@ def main():
     timestamp = f"{current_hour}{display_min}"
     timestamp = str(int(timestamp)) 
 
-    # 2. Date/Day Vars
+    # Date/Day Vars
     date_str = kl_now.strftime("%d.%m.%y")
     day_name = kl_now.strftime("%A").upper()
     month_name = kl_now.strftime("%B").upper()
@@ -270,94 +406,82 @@ def main():
     # Holiday Check
     is_hol, is_schol, is_fest = check_holidays(kl_now)
 
-    # ================= OPTIMIZATION =================
-    # Fetch Weather ONCE for the central location (FSKTM)
-    # This prevents 27 separate API calls which risk timeout
-    print("Fetching weather for the area...")
-    gen_lat, gen_lon = 3.127503, 101.650681
-    gen_raining, gen_clear, gen_windy, gen_hot = get_weather(gen_lat, gen_lon)
-    # ================================================
+    return {
+        'timestamp': timestamp,
+        'is_PeakHour': is_peak,
+        'time_of_day': time_of_day,
+        'day_name': day_name,
+        'type_of_day': is_weekend,
+        'month': month_name,
+        'date': date_str,
+        'is_Holiday': is_hol,
+        'is_SchoolHoliday': is_schol,
+        'is_Festive': is_fest,
+    }
 
-    # 3. Iterate Routes
-    rows = []
-    
-    # Cache YOLO results to avoid duplicate processing
-    camera_cache = {} 
-    
-    for i, route in enumerate(ROUTES):
-        print(f"Processing route {i+1}/{len(ROUTES)}: {route['origin_location']} -> {route['destination_location']}")
-        
-        row = route.copy() 
-        
-        # Add Time/Date Columns
-        row['timestamp'] = timestamp
-        row['is_PeakHour'] = is_peak
-        row['time_of_day'] = time_of_day
-        row['day_name'] = day_name
-        row['type_of_day'] = is_weekend
-        row['month'] = month_name
-        row['date'] = date_str
-        
-        # Add Holiday Columns
-        row['is_Holiday'] = is_hol
-        row['is_SchoolHoliday'] = is_schol
-        row['is_Festive'] = is_fest
-        
-        # Apply OPTIMIZED Weather Data (Same for all routes in this batch)
-        row['origin_Raining'] = gen_raining
-        row['origin _ClearVisibility'] = gen_clear
-        row['origin_Windy'] = gen_windy
-        row['origin_Hot'] = gen_hot
-        
-        # Traffic (Google)
-        duration, is_jam = get_traffic_google(row['origin_coordinate'], row['destination_coordinate'])
-        row['calculated_journeytime_minute'] = int(duration)
-        row['is_Jam'] = is_jam
-        
-        # YOLO Analysis
-        conc = "NA"
-        if row['active_CAM'] == 1:
-            cam_name = row['origin_location']
-            
-            # If origin isn't a camera, check destination
-            if cam_name not in CAMERA_MAP and row['destination_location'] in CAMERA_MAP:
-                cam_name = row['destination_location']
-            
-            if cam_name in CAMERA_MAP:
-                if cam_name in camera_cache:
-                    conc = camera_cache[cam_name]
-                else:
-                    conc = analyze_camera_traffic(cam_name)
-                    camera_cache[cam_name] = conc
-        
-        row['origin_VehicleConcentration'] = conc
-        
-        # Data Pass: 1 if everything essential is there (API worked)
-        row['data_Pass'] = 1 if row['calculated_journeytime_minute'] > 0 else 0
-        
-        rows.append(row)
-        time.sleep(0.5) # Slight delay to be nice to Google API
+def save_rows(rows):
+    """Writes a date-partitioned Parquet file, plus the legacy CSV the dashboard reads.
 
-    # 4. Save to CSV
-    df = pd.DataFrame(rows)
+    A Parquet or validation failure does not stop the CSV from being written (the rows can
+    be re-imported from it later); it is only fatal when the CSV is disabled.
+    """
+    import pandas as pd
+    from traffic_storage import COLUMNS, write_rows
+    df = pd.DataFrame(rows)[COLUMNS]
     
-    # Reorder columns
-    cols = ['timestamp', 'is_PeakHour', 'time_of_day', 'day_name', 'type_of_day', 'month', 'date', 
-            'origin_location', 'origin_coordinate', 'destination_location', 'destination_coordinate', 
-            'direction', 'EG1', 'LG1', 'EG2', 'LG2', 'EG3', 'LG3', 'EG4', 'LG4', 'FSKTM', 
-            'active_CAM', 'origin_Raining', 'origin _ClearVisibility', 'origin_Windy', 'origin_Hot', 
-            'origin_VehicleConcentration', 'is_Holiday', 'is_SchoolHoliday', 'is_Festive', 
-            'calculated_journeytime_minute', 'data_Pass', 'is_Jam']
+    with metrics.stage('save_parquet'):
+        try:
+            for path in write_rows(df):
+                print(f"Wrote {path}")
+        except Exception as e:
+            metrics.incr('storage_errors')
+            print(f"Parquet write failed: {e}")
+            if not WRITE_LEGACY_CSV:
+                raise
     
-    df = df[cols]
+    if WRITE_LEGACY_CSV:
+        file_name = 'traffic_data.csv'
+        with metrics.stage('save_csv'):
+            if os.path.exists(file_name):
+                df.to_csv(file_name, mode='a', header=False, index=False)
+            else:
+                df.to_csv(file_name, index=False)
+
+def main(kl_now=None, weather=None, camera_results=None, reset_metrics=True):
+    # 1. Time Setup (KL Time)
+    kl_now = kl_now or kl_time()
     
-    file_name = 'traffic_data.csv'
-    if os.path.exists(file_name):
-        df.to_csv(file_name, mode='a', header=False, index=False)
-    else:
-        df.to_csv(file_name, index=False)
+    # Ensure between 0800 and 2100
+    if not in_operating_hours(kl_now):
+        print(f"Current time {kl_now} is outside operating hours (0800-2100). Exiting.")
+        return
+
+    # Stage timers and counters cover this run only (written to COLLECTOR_METRICS). The
+    # daemon resets per slot cycle instead, so its camera/weather refreshes are kept.
+    if reset_metrics:
+        metrics.reset()
+
+    # 2. Date/Day/Holiday Vars
+    with metrics.stage('calendar'):
+        base = slot_fields(kl_now)
+
+    # 3. Collect Routes (Google, cameras and weather fan out over a bounded thread pool)
+    with metrics.stage('collect'):
+        rows = collect_routes(ROUTES, base, weather=weather, camera_results=camera_results, slot=kl_now)
+
+    # 4. Save
+    save_rows(rows)
         
+    metrics.write()
     print("Data collection complete.")
 
 if __name__ == "__main__":
-    main()
+    # python traffic_collector.py --daemon [options]  (see collector_daemon.py)
+    if '--daemon' in sys.argv[1:]:
+        # Let collector_daemon's `import traffic_collector` find this module instead of
+        # executing a second copy (with its own config, limiter and START_TIME)
+        sys.modules.setdefault('traffic_collector', sys.modules[__name__])
+        from collector_daemon import run
+        run([a for a in sys.argv[1:] if a != '--daemon'])
+    else:
+        main()
@@ -0,0 +1,235 @@
+import os
+import abc
+import math
+import time
+import zlib
+import threading
+from datetime import datetime
+
+from weather_service import parse_coordinate
+
+# ================= CONFIGURATION =================
+# 'google' (Distance Matrix API) or 'fake' (offline, deterministic)
+TRAFFIC_PROVIDER = os.environ.get('TRAFFIC_PROVIDER', 'google')
+# Overridden by the end-to-end benchmark to point at a local stand-in
+GOOGLE_BASE_URL = os.environ.get('GOOGLE_MAPS_BASE_URL', 'https://maps.googleapis.com')
+
+# Distance Matrix limits per request
+MAX_ORIGINS = 25
+MAX_DESTINATIONS = 25
+MAX_ELEMENTS = 100
+
+# Distance Matrix bills per element (origin x destination cell), not per request.
+# 'exact': only request cells that are wanted (origins with the same destinations share a
+#          request); 28 routes = 28 elements in 8 requests.
+# 'dense': fewest requests, paying for unused cells; 28 routes = 77 elements in 1 request.
+TRAFFIC_BATCHING = os.environ.get('TRAFFIC_BATCHING', 'exact')
+
+# Responses are cached per coordinate pair and departure bucket
+TRAFFIC_BUCKET_SECONDS = 15 * 60
+TRAFFIC_CACHE_TTL = 10 * 60
+
+# Simulated round trip (s) per request for the fake provider
+FAKE_LATENCY = float(os.environ.get('FAKE_TRAFFIC_LATENCY', 0))
+
+# Jam Logic: If traffic makes it 25% slower than standard
+JAM_RATIO = 1.25
+
+# ================= BATCHING =================
+
+def plan_dense_batches(pairs, max_origins=MAX_ORIGINS, max_destinations=MAX_DESTINATIONS, max_elements=MAX_ELEMENTS):
+    """Greedily groups (origin, dest) pairs into as few origins x destinations matrices as the limits allow."""
+    batches = []
+    origins, dests, members = [], [], []
+    for origin, dest in sorted(set(pairs)):
+        new_origins = origins if origin in origins else origins + [origin]
+        new_dests = dests if dest in dests else dests + [dest]
+        if members and (len(new_origins) > max_origins or len(new_dests) > max_destinations
+                        or len(new_origins) * len(new_dests) > max_elements):
+            batches.append((origins, dests, members))
+            new_origins, new_dests, members = [origin], [dest], []
+        origins, dests = new_origins, new_dests
+        members.append((origin, dest))
+    if members:
+        batches.append((origins, dests, members))
+    return batches
+
+def plan_exact_batches(pairs, max_origins=MAX_ORIGINS, max_destinations=MAX_DESTINATIONS, max_elements=MAX_ELEMENTS):
+    """Groups origins that want exactly the same destinations, so every requested element is a wanted pair."""
+    wanted = {}
+    for origin, dest in sorted(set(pairs)):
+        wanted.setdefault(origin, []).append(dest)
+    groups = {}
+    for origin, dests in wanted.items():
+        groups.setdefault(tuple(dests), []).append(origin)
+
+    batches = []
+    for all_dests, all_origins in groups.items():
+        for d in range(0, len(all_dests), max_destinations):
+            dests = list(all_dests[d:d + max_destinations])
+            per_request = max(1, min(max_origins, max_elements // len(dests)))
+            for o in range(0, len(all_origins), per_request):
+                origins = all_origins[o:o + per_request]
+                batches.append((origins, dests, [(a, b) for a in origins for b in dests]))
+    return batches
+
+def plan_batches(pairs, mode=None):
+    """Splits (origin, dest) pairs into Distance Matrix requests per TRAFFIC_BATCHING."""
+    if (mode or TRAFFIC_BATCHING) == 'dense':
+        return plan_dense_batches(pairs)
+    return plan_exact_batches(pairs)
+
+def to_result(duration_min, duration_traffic_min):
+    """(journey minutes, is_jam) in the form main() writes."""
+    is_jam = 1 if duration_traffic_min > (duration_min * JAM_RATIO) else 0
+    return int(duration_traffic_min), is_jam
+
+# ================= PROVIDERS =================
+
+class TrafficProvider(abc.ABC):
+    """Journey times for many coordinate pairs: deduplicated, batched and cached.
+
+    Subclasses implement query(origins, dests, departure_time), returning
+    {(origin, dest): (duration_min, duration_traffic_min)} for the pairs it could resolve.
+    """
+    def __init__(self, limiter=None):
+        self.limiter = limiter              # called before each request
+        self.requests = 0
+        self.elements = 0                   # billed origin x destination cells
+        self._cache = {}                    # (origin, dest, bucket) -> (expires_at, result)
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def query(self, origins, dests, departure_time):
+        """{(origin, dest): (duration_min, duration_traffic_min)} for one origins x dests request."""
+
+    def lookup(self, pairs, departure_time):
+        """Splits pairs into cached results and the requests still needed: (results, batches).
+
+        Each batch is (origins, dests, members) for fetch(); callers may run them in parallel.
+        """
+        bucket = int(departure_time.timestamp() // TRAFFIC_BUCKET_SECONDS)
+        now = time.monotonic()
+        results, missing = {}, []
+        with self._lock:
+            for pair in set(pairs):
+                cached = self._cache.get((*pair, bucket))
+                if cached and cached[0] > now:
+                    results[pair] = cached[1]
+                else:
+                    missing.append(pair)
+        return results, plan_batches(missing)
+
+    def fetch(self, batch, departure_time, timings=None):
+        """Runs one planned request. Returns {(origin, dest): (journey minutes, is_jam)}, empty on error.
+
+        If a timings dict is given, it receives the request round trip (s) for every pair fetched.
+        """
+        from instrumentation import metrics
+
+        origins, dests, members = batch
+        bucket = int(departure_time.timestamp() // TRAFFIC_BUCKET_SECONDS)
+        if self.limiter:
+            self.limiter()
+        with self._lock:
+            self.requests += 1
+            self.elements += len(origins) * len(dests)
+        start = time.perf_counter()
+        try:
+            matrix = self.query(origins, dests, departure_time)
+        except Exception as e:
+            metrics.incr('traffic_errors')
+            print(f"Traffic provider error: {e}")
+            return {}
+        elapsed = time.perf_counter() - start
+        metrics.observe('traffic_request', elapsed)
+        if timings is not None:
+            timings.update(dict.fromkeys(members, elapsed))
+        results = {pair: to_result(*matrix[pair]) for pair in members if pair in matrix}
+        with self._lock:
+            for pair, result in results.items():
+                self._cache[(*pair, bucket)] = (time.monotonic() + TRAFFIC_CACHE_TTL, result)
+        return results
+
+    def journey_times(self, pairs, departure_time=None, timings=None):
+        """Returns {(origin, dest): (journey minutes, is_jam)}, running the requests one after another.
+
+        Pairs that fail are left out.
+        """
+        departure_time = departure_time or datetime.now()
+        results, batches = self.lookup(pairs, departure_time)
+        for batch in batches:
+            results.update(self.fetch(batch, departure_time, timings))
+        return results
+
+class GoogleTrafficProvider(TrafficProvider):
+    """Google Distance Matrix API with one shared client.
+
+    The client retries 5xx and rate-limit replies itself. No attempt starts after
+    timeout / 2 and each attempt is cut off after timeout / 2, so one request stays
+    within about timeout seconds in all.
+    """
+    def __init__(self, key, timeout=30, **kwargs):
+        super().__init__(**kwargs)
+        import googlemaps
+        self.client = googlemaps.Client(key=key, timeout=timeout / 2, retry_timeout=timeout / 2,
+                                        base_url=GOOGLE_BASE_URL)
+
+    def query(self, origins, dests, departure_time):
+        resp = self.client.distance_matrix(origins, dests, mode="driving", departure_time=departure_time)
+        matrix = {}
+        for origin, row in zip(origins, resp['rows']):
+            for dest, element in zip(dests, row['elements']):
+                if element.get('status') != 'OK':
+                    continue
+                duration = element['duration']['value'] / 60
+                duration_traffic = element.get('duration_in_traffic', element['duration'])['value'] / 60
+                matrix[(origin, dest)] = (duration, duration_traffic)
+        return matrix
+
+def _distance_km(origin, dest):
+    (lat1, lon1), (lat2, lon2) = parse_coordinate(origin), parse_coordinate(dest)
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+class FakeTrafficProvider(TrafficProvider):
+    """Offline stand-in: deterministic journey times from straight-line distance and time of day."""
+    def __init__(self, latency=FAKE_LATENCY, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    def query(self, origins, dests, departure_time):
+        if self.latency:
+            time.sleep(self.latency)
+        hour = departure_time.hour + departure_time.minute / 60
+        peak = 8 <= hour <= 9 or 12 <= hour <= 13 or 17.5 <= hour <= 19
+        matrix = {}
+        for origin in origins:
+            for dest in dests:
+                # Road distance ~1.4x straight line at ~30 km/h free flow, plus 2 minutes for junctions
+                duration = _distance_km(origin, dest) * 1.4 / 30 * 60 + 2
+                noise = zlib.crc32(f"{origin}|{dest}|{departure_time:%Y%m%d%H}".encode()) % 20 / 100
+                factor = (1.3 if peak else 1.0) + noise
+                matrix[(origin, dest)] = (duration, duration * factor)
+        return matrix
+
+# ================= SHARED PROVIDER =================
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_provider(key=None, timeout=30, **kwargs):
+    """Returns the process-wide traffic provider (TRAFFIC_PROVIDER selects google or fake).
+
+    Returns None when Google is selected but no API key is available.
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if TRAFFIC_PROVIDER == 'fake':
+                _provider = FakeTrafficProvider(**kwargs)
+            elif key:
+                _provider = GoogleTrafficProvider(key, timeout=timeout, **kwargs)
+        return _provider
@@ -0,0 +1,214 @@
+"""Date-partitioned Parquet storage for collected traffic rows.
+
+Layout: data/traffic/day=YYYY-MM-DD/part-<HHMM>-<time_ns>.parquet
+
+Usage:
+    python traffic_storage.py import-csv [traffic_data.csv]   # migrate existing history
+    python traffic_storage.py compact                         # merge each past day's run files
+    python traffic_storage.py export-csv [traffic_data.csv] [--complete-days]
+                                                              # legacy CSV for the dashboard
+"""
+import os
+import sys
+import glob
+import time
+from datetime import datetime
+
+# ================= CONFIGURATION =================
+STORAGE_DIR = os.environ.get('TRAFFIC_STORAGE_DIR', os.path.join('data', 'traffic'))
+LEGACY_CSV = 'traffic_data.csv'
+
+# Column order written by main()
+COLUMNS = ['timestamp', 'is_PeakHour', 'time_of_day', 'day_name', 'type_of_day', 'month', 'date',
+           'origin_location', 'origin_coordinate', 'destination_location', 'destination_coordinate',
+           'direction', 'EG1', 'LG1', 'EG2', 'LG2', 'EG3', 'LG3', 'EG4', 'LG4', 'FSKTM',
+           'active_CAM', 'origin_Raining', 'origin _ClearVisibility', 'origin_Windy', 'origin_Hot',
+           'origin_VehicleConcentration', 'is_Holiday', 'is_SchoolHoliday', 'is_Festive',
+           'calculated_journeytime_minute', 'data_Pass', 'is_Jam']
+
+CATEGORY_COLUMNS = ['time_of_day', 'day_name', 'type_of_day', 'month', 'date',
+                    'origin_location', 'origin_coordinate', 'destination_location', 'destination_coordinate',
+                    'direction', 'origin_VehicleConcentration']
+INT16_COLUMNS = ['timestamp', 'calculated_journeytime_minute']
+FLAG_COLUMNS = ['is_PeakHour', 'EG1', 'LG1', 'EG2', 'LG2', 'EG3', 'LG3', 'EG4', 'LG4', 'FSKTM',
+                'active_CAM', 'origin_Raining', 'origin _ClearVisibility', 'origin_Windy', 'origin_Hot',
+                'is_Holiday', 'is_SchoolHoliday', 'is_Festive', 'data_Pass', 'is_Jam']
+
+DATE_FMT = "%d.%m.%y"
+PARTITION_KEY = 'day'
+
+# Days with at least this many files are merged by compact()
+COMPACT_MIN_FILES = 2
+
+# ================= SCHEMA =================
+
+def row_problems(df):
+    """Yields (column, message, bad_row_mask) for every value check validate() applies."""
+    import pandas as pd
+
+    for col in FLAG_COLUMNS:
+        values = pd.to_numeric(df[col], errors='coerce')
+        yield col, f"Column {col} must contain only 0/1", ~values.isin([0, 1])
+    for col in INT16_COLUMNS:
+        values = pd.to_numeric(df[col], errors='coerce')
+        yield col, f"Column {col} must be an integer between 0 and 32767", ~values.between(0, 32767)
+    dates = pd.to_datetime(df['date'].astype(str), format=DATE_FMT, errors='coerce')
+    yield 'date', "Column date must be formatted dd.mm.yy", dates.isna()
+
+def validate(df):
+    """Checks columns and value ranges, raising ValueError on bad rows. Returns the compact-typed frame."""
+    import pandas as pd
+
+    missing = [c for c in COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    df = df[COLUMNS].copy()
+
+    for _, message, bad in row_problems(df):
+        if bad.any():
+            raise ValueError(message)
+    for col in FLAG_COLUMNS:
+        df[col] = pd.to_numeric(df[col]).astype('int8')
+    for col in INT16_COLUMNS:
+        df[col] = pd.to_numeric(df[col]).astype('int16')
+
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype(str).astype('category')
+    return df
+
+# ================= WRITE / READ =================
+
+def partition_dir(day, root=STORAGE_DIR):
+    return os.path.join(root, f"{PARTITION_KEY}={day:%Y-%m-%d}")
+
+def write_rows(df, root=STORAGE_DIR):
+    """Validates rows and writes them as one new Parquet file per day. Returns the paths written."""
+    import pandas as pd
+
+    df = validate(df)
+    days = pd.to_datetime(df['date'].astype(str), format=DATE_FMT)
+    paths = []
+    for day, part in df.groupby(days.dt.date, observed=True):
+        os.makedirs(partition_dir(day, root), exist_ok=True)
+        stamp = int(part['timestamp'].iloc[0])
+        path = os.path.join(partition_dir(day, root), f"part-{stamp:04d}-{time.time_ns()}.parquet")
+        part.reset_index(drop=True).to_parquet(path, index=False, compression='zstd')
+        paths.append(path)
+    return paths
+
+def partition_files(root=STORAGE_DIR, start=None, end=None):
+    """Parquet files for days in [start, end] (datetime.date, inclusive), oldest first."""
+    files = []
+    for day_dir in sorted(glob.glob(os.path.join(root, f"{PARTITION_KEY}=*"))):
+        day = datetime.strptime(os.path.basename(day_dir).split('=', 1)[1], "%Y-%m-%d").date()
+        if (start and day < start) or (end and day > end):
+            continue
+        files.extend(sorted(glob.glob(os.path.join(day_dir, '*.parquet'))))
+    return files
+
+def read_rows(root=STORAGE_DIR, start=None, end=None, columns=None):
+    """Reads rows for a date range. Only the matching day partitions are opened."""
+    return read_files(partition_files(root, start, end), columns)
+
+def read_files(files, columns=None):
+    """Reads rows from a list of Parquet files, in order."""
+    import pandas as pd
+    import pyarrow.dataset as ds
+
+    if not files:
+        return pd.DataFrame(columns=columns or COLUMNS)
+    # Files carry their own category dictionaries; unify them so categoricals survive the concat
+    table = ds.dataset(files, format='parquet').to_table(columns=columns)
+    return table.unify_dictionaries().to_pandas()
+
+# ================= MAINTENANCE =================
+
+def replace_partition(day_dir, df):
+    """Replaces every file in a day partition with one file holding df.
+
+    Each rewrite gets a new name, so readers that track files by name (dashboard_summary)
+    see the day as changed.
+    """
+    files = sorted(glob.glob(os.path.join(day_dir, '*.parquet')))
+    df = validate(df).sort_values('timestamp', kind='stable')
+    tmp = os.path.join(day_dir, 'compacted.parquet.tmp')
+    df.to_parquet(tmp, index=False, compression='zstd')
+    # part-0000 sorts before the day's run files, which are all newer than these rows
+    final = os.path.join(day_dir, f"part-0000-{time.time_ns()}.parquet")
+    os.replace(tmp, final)
+    for f in files:
+        if f != final:
+            os.remove(f)
+
+def compact(root=STORAGE_DIR, min_files=COMPACT_MIN_FILES, before=None):
+    """Merges each day's small run files into a single file. Returns the number of days compacted.
+
+    Only days before `before` (default: today in KL) are touched, so the day still being
+    collected is not rewritten after every run.
+    """
+    import pandas as pd
+
+    if before is None:
+        from traffic_collector import kl_time
+        before = kl_time().date()
+    compacted = 0
+    for day_dir in sorted(glob.glob(os.path.join(root, f"{PARTITION_KEY}=*"))):
+        day = datetime.strptime(os.path.basename(day_dir).split('=', 1)[1], "%Y-%m-%d").date()
+        if day >= before:
+            continue
+        files = sorted(glob.glob(os.path.join(day_dir, '*.parquet')))
+        if len(files) < min_files:
+            continue
+        replace_partition(day_dir, pd.concat([pd.read_parquet(f) for f in files], ignore_index=True))
+        compacted += 1
+    return compacted
+
+def export_csv(path=LEGACY_CSV, root=STORAGE_DIR, before=None):
+    """Writes stored rows to a CSV in the original traffic_data.csv layout. Returns the row count.
+
+    With `before` (datetime.date), only days before it are exported, so re-exporting on
+    every run only changes the file once a day.
+    """
+    from datetime import timedelta
+
+    df = read_rows(root, end=before - timedelta(days=1) if before else None)
+    if df.empty:
+        # Never replace existing history with an empty file (e.g. the store wasn't migrated)
+        print(f"No stored rows to export; {path} left as it is")
+        return 0
+    df.to_csv(path, index=False)
+    return len(df)
+
+def import_csv(path=LEGACY_CSV, root=STORAGE_DIR):
+    """Loads an existing traffic_data.csv into the partitioned store, skipping (and reporting) bad rows.
+
+    Returns the number of rows imported.
+    """
+    import pandas as pd
+
+    # 'NA' is a real concentration value, not a missing one
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    missing = [c for c in COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    bad = pd.Series(False, index=df.index)
+    for col, _, rows in row_problems(df):
+        if rows.any():
+            print(f"Skipping {int(rows.sum())} row(s) with a bad {col} value "
+                  f"(CSV lines {', '.join(str(i + 2) for i in df.index[rows][:5])}{'...' if rows.sum() > 5 else ''})")
+        bad |= rows
+    good = df[~bad]
+    if len(good):
+        write_rows(good, root)
+    return len(good)
+
+if __name__ == "__main__":
+    commands = {'compact': compact, 'export-csv': export_csv, 'import-csv': import_csv}
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print(__doc__)
+        sys.exit(1)
+    args, kwargs = [a for a in sys.argv[2:] if a != '--complete-days'], {}
+    if '--complete-days' in sys.argv[2:]:
+        from traffic_collector import kl_time
+        kwargs['before'] = kl_time().date()
+    print(f"{sys.argv[1]}: {commands[sys.argv[1]](*args, **kwargs)}")
@@ -0,0 +1,96 @@
+import os
+import threading
+from datetime import timedelta
+
+# ================= CONFIGURATION =================
+WEATHER_URL = os.environ.get('OPEN_METEO_URL', "https://api.open-meteo.com/v1/forecast")
+WEATHER_FIELDS = "temperature_2m,weather_code,wind_speed_10m,visibility"
+
+# Responses are cached on disk. The TTL is just under the 30-minute schedule, so
+# every scheduled run gets fresh data while repeated or more frequent runs reuse it.
+WEATHER_CACHE = os.environ.get('WEATHER_CACHE', '.weather_cache')
+WEATHER_CACHE_TTL = timedelta(minutes=25)
+
+# Used when the API fails: not raining, clear, calm, not hot
+DEFAULT_WEATHER = (0, 1, 0, 0)
+
+# Rain: Codes 51-67, 80-82, 95-99
+RAIN_CODES = {51, 53, 55, 61, 63, 65, 66, 67, 80, 81, 82, 95, 96, 99}
+
+_session = None
+_session_lock = threading.Lock()
+
+# ================= HELPERS =================
+
+def get_session(retries=3, backoff=0.5):
+    """Shared cached session that also retries connection errors and 5xx responses."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests_cache
+            from retry_requests import retry
+            cached = requests_cache.CachedSession(WEATHER_CACHE, expire_after=WEATHER_CACHE_TTL)
+            _session = retry(cached, retries=retries, backoff_factor=backoff)
+        return _session
+
+def parse_coordinate(text):
+    """'3.118774, 101.663074' -> (3.118774, 101.663074)"""
+    lat, lon = text.split(',')
+    return float(lat), float(lon)
+
+def weather_flags(current):
+    """Open-Meteo 'current' block -> (is_raining, is_clear, is_windy, is_hot)."""
+    is_raining = 1 if current['weather_code'] in RAIN_CODES else 0
+    # Visibility: OpenMeteo gives meters. >10km is Clear.
+    is_clear = 1 if current['visibility'] >= 10000 else 0
+    # Windy: > 20 km/h
+    is_windy = 1 if current['wind_speed_10m'] > 20 else 0
+    # Hot: >= 30 C
+    is_hot = 1 if current['temperature_2m'] >= 30 else 0
+    return is_raining, is_clear, is_windy, is_hot
+
+# ================= WEATHER SERVICE =================
+
+def get_weather_many(points, url=WEATHER_URL, force_refresh=False):
+    """Current weather for many (lat, lon) points in one multi-location request.
+
+    Returns {(lat, lon): flags}. Points fall back to DEFAULT_WEATHER if the request fails.
+    force_refresh skips the cached response (and stores the new one), for callers that
+    poll more often than WEATHER_CACHE_TTL.
+    """
+    from instrumentation import metrics
+
+    points = list(dict.fromkeys(points))
+    if not points:
+        return {}
+    try:
+        params = {
+            "latitude": ",".join(str(lat) for lat, _ in points),
+            "longitude": ",".join(str(lon) for _, lon in points),
+            "current": WEATHER_FIELDS,
+            "timezone": "Asia/Singapore" # KL Time
+        }
+        with metrics.stage('weather'):
+            resp = get_session().get(url, params=params, timeout=10, force_refresh=force_refresh)
+        if getattr(resp, 'from_cache', False):
+            metrics.incr('weather_cache_hits')
+
+        if resp.status_code != 200:
+            metrics.incr('weather_errors')
+            print(f"Weather API Error: Status {resp.status_code}")
+            return {p: DEFAULT_WEATHER for p in points}
+
+        data = resp.json()
+        # A single location comes back as one object, several as a list in request order
+        locations = data if isinstance(data, list) else [data]
+        return {p: weather_flags(loc['current']) for p, loc in zip(points, locations)}
+    except Exception as e:
+        metrics.incr('weather_errors')
+        print(f"Weather API Error: {e}")
+        return {p: DEFAULT_WEATHER for p in points}
+
+def get_route_weather(routes, force_refresh=False):
+    """Weather for every route origin. Returns {origin_coordinate: flags}."""
+    coords = list(dict.fromkeys(r['origin_coordinate'] for r in routes))
+    by_point = get_weather_many([parse_coordinate(c) for c in coords], force_refresh=force_refresh)
+    return {c: by_point.get(parse_coordinate(c), DEFAULT_WEATHER) for c in coords}
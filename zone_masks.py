@@ -0,0 +1,136 @@
+import os
+import hashlib
+import cv2
+import numpy as np
+
+# ================= CONFIGURATION =================
+# Filled masks are cached on disk, keyed by a hash of the reference image,
+# so a redrawn green line automatically produces a fresh mask.
+ZONE_CACHE_DIR = os.environ.get('ZONE_CACHE_DIR', '.zone_cache')
+
+# 'centre': full area of boxes whose centre lies in the zone (the original metric, can exceed
+# 100% and is what the 60/40 thresholds and stored history were calibrated on).
+# 'overlap': in-zone pixels covered by at least one box (overlaps counted once, at most 100%);
+# its thresholds have not been recalibrated, so it is opt-in.
+DENSITY_METRIC = os.environ.get('DENSITY_METRIC', 'centre')
+
+# Green line colour range (HSV)
+GREEN_LOW = np.array([40, 100, 100])
+GREEN_HIGH = np.array([80, 255, 255])
+
+# In-process cache: reference path -> (hash, Zone)
+_zones = {}
+
+# ================= ZONE MASKS =================
+
+class Zone:
+    """Filled road zone for one camera."""
+    def __init__(self, mask):
+        self.mask = mask.astype(bool)
+        self.shape = self.mask.shape
+        self.total_pixels = int(np.count_nonzero(self.mask))
+
+def fill_between_lines(line_mask):
+    """Fills each row between its first and last green pixel (vectorized row-wise fill)."""
+    green = line_mask > 0
+    width = green.shape[1]
+    has_green = green.any(axis=1)
+    first = np.argmax(green, axis=1)
+    last = width - 1 - np.argmax(green[:, ::-1], axis=1)
+    cols = np.arange(width)
+    # Same span as the old loop: indices[0]:indices[-1] (last column excluded)
+    filled = (cols >= first[:, None]) & (cols < last[:, None]) & has_green[:, None]
+    return filled.astype(np.uint8) * 255
+
+def build_zone_mask(ref_img):
+    """Generates the filled zone mask from a reference image with green boundary lines."""
+    hsv = cv2.cvtColor(ref_img, cv2.COLOR_BGR2HSV)
+    lines = cv2.inRange(hsv, GREEN_LOW, GREEN_HIGH)
+    return fill_between_lines(lines)
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def load_zone(ref_path):
+    """Returns the Zone for a reference image, building and caching the mask only when it changes."""
+    if not os.path.exists(ref_path):
+        return None
+
+    digest = _file_hash(ref_path)
+    cached = _zones.get(ref_path)
+    if cached and cached[0] == digest:
+        return cached[1]
+
+    cache_file = os.path.join(ZONE_CACHE_DIR, f"{digest}.npz")
+    mask = None
+    if os.path.exists(cache_file):
+        try:
+            data = np.load(cache_file)
+            mask = np.unpackbits(data['bits'], count=int(np.prod(data['shape']))).reshape(data['shape'])
+        except Exception as e:
+            print(f"Ignoring unreadable zone cache {cache_file}: {e}")
+
+    if mask is None:
+        ref_img = cv2.imread(ref_path)
+        if ref_img is None:
+            return None
+        mask = build_zone_mask(ref_img) > 0
+        try:
+            os.makedirs(ZONE_CACHE_DIR, exist_ok=True)
+            np.savez_compressed(cache_file, bits=np.packbits(mask), shape=np.array(mask.shape))
+        except OSError as e:
+            print(f"Could not write zone cache: {e}")
+
+    zone = Zone(mask)
+    _zones[ref_path] = (digest, zone)
+    return zone
+
+# ================= DENSITY KERNEL =================
+
+def _clip_boxes(zone, boxes):
+    """Rounds xyxy boxes to integer pixel edges inside the zone bounds."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    h, w = zone.shape
+    x1 = np.clip(np.floor(boxes[:, 0]), 0, w).astype(np.int64)
+    y1 = np.clip(np.floor(boxes[:, 1]), 0, h).astype(np.int64)
+    x2 = np.clip(np.ceil(boxes[:, 2]), 0, w).astype(np.int64)
+    y2 = np.clip(np.ceil(boxes[:, 3]), 0, h).astype(np.int64)
+    return x1, y1, x2, y2
+
+def centred_area(zone, boxes):
+    """Summed full area of the boxes whose centre pixel lies in the zone (overlaps counted twice)."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if not len(boxes):
+        return 0.0
+    h, w = zone.shape
+    cx = ((boxes[:, 0] + boxes[:, 2]) / 2).astype(np.int64)
+    cy = ((boxes[:, 1] + boxes[:, 3]) / 2).astype(np.int64)
+    inside = (cx >= 0) & (cx < w) & (cy >= 0) & (cy < h)
+    inside[inside] = zone.mask[cy[inside], cx[inside]]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return float(areas[inside].sum())
+
+def occupied_area(zone, boxes):
+    """In-zone pixels covered by at least one box. Overlapping boxes are counted once."""
+    x1, y1, x2, y2 = _clip_boxes(zone, boxes)
+    keep = (x2 > x1) & (y2 > y1)
+    if not keep.any():
+        return 0
+    x1, y1, x2, y2 = x1[keep], y1[keep], x2[keep], y2[keep]
+    # 2D difference array: +1 inside each box after a cumulative sum over both axes
+    h, w = zone.shape
+    diff = np.zeros((h + 1, w + 1), dtype=np.int32)
+    np.add.at(diff, (y1, x1), 1)
+    np.add.at(diff, (y1, x2), -1)
+    np.add.at(diff, (y2, x1), -1)
+    np.add.at(diff, (y2, x2), 1)
+    covered = diff.cumsum(0).cumsum(1)[:h, :w] > 0
+    return int(np.count_nonzero(covered & zone.mask))
+
+def zone_density(zone, boxes, metric=DENSITY_METRIC):
+    """Vehicle box area as a percentage of the zone, by the selected DENSITY_METRIC."""
+    if zone is None or zone.total_pixels == 0:
+        return None
+    area = occupied_area(zone, boxes) if metric == 'overlap' else centred_area(zone, boxes)
+    return area / zone.total_pixels * 100